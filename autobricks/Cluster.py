@@ -1,7 +1,8 @@
-from .api_service import ApiService, autobricks_logging
+from .api_service import shared_api_service, autobricks_logging
 import os
 import yaml
 from enum import Enum
+from typing import List
 import time
 from .Dbfs import dbfs_upload
 
@@ -9,7 +10,11 @@ _logger = autobricks_logging.get_logger(__name__)
 
 endpoint = "clusters"
 
-_api_service = ApiService()
+_api_service = shared_api_service
+
+_MIN_WAIT_SECONDS = 1
+_MAX_WAIT_SECONDS = 10
+_WAIT_BACKOFF = 1.5
 
 
 class ClusterState(Enum):
@@ -200,11 +205,48 @@ def cluster_get(cluster_id: str):
     return _api_service.api_get(endpoint, "get", params=params)
 
 
-def cluster_wait_until_state(
-    cluster_id: str, cluster_state: ClusterState, wait_seconds: int = 10
+def _cluster_state_reached(cluster: dict, cluster_state: ClusterState):
+    """
+    Returns True if the cluster has reached the state and raises an exception
+    if the cluster can no longer reach it.
+    """
+    cluster_id = cluster["cluster_id"]
+    state = ClusterState[cluster["state"]]
+
+    if state == ClusterState.ERROR:
+        msg = f"The cluster_id {cluster_id} is in error state: {cluster.get('state_message')}"
+        _logger.error(msg)
+        raise Exception(msg)
+
+    elif state == ClusterState.TERMINATED and cluster_state == ClusterState.RUNNING:
+        msg = f"The cluster_id {cluster_id} {ClusterState.TERMINATED.name}: {cluster.get('state_message')}"
+        _logger.error(msg)
+        raise Exception(msg)
+
+    return state == cluster_state
+
+
+def clusters_wait_until_state(
+    cluster_ids: List[str],
+    cluster_state: ClusterState,
+    max_wait_seconds: float = _MAX_WAIT_SECONDS,
+    timeout: float = None,
 ):
+    """
+    cluster_ids:List[str]           the clusters to wait for
+    cluster_state:ClusterState      the state to wait for, RUNNING or TERMINATED
+    max_wait_seconds:float=10       longest seconds between checking the cluster states
+    timeout:float=None              seconds to wait before raising a TimeoutError
+
+    Blocks until all the clusters reach the state. The states are checked straight away
+    and then at intervals that back off from 1 second up to max_wait_seconds, resetting
+    when a cluster changes state. A single cluster is checked with clusters/get and
+    several clusters with one clusters/list. Clusters that fail to reach the state are
+    raised together once the others have finished waiting.
+    Returns the clusters by cluster_id.
+    """
     _logger.info(
-        f"Waiting for the cluster_id {cluster_id} to the reach the state: {cluster_state.name}"
+        f"Waiting for the cluster_ids {cluster_ids} to the reach the state: {cluster_state.name}"
     )
 
     if cluster_state not in [ClusterState.RUNNING, ClusterState.TERMINATED]:
@@ -212,32 +254,80 @@ def cluster_wait_until_state(
         _logger.error(msg)
         raise Exception(msg)
 
-    previous_state = ClusterState.UNKNOWN
-    _logger.info(f"The cluster_id {cluster_id} state: {previous_state.name}")
+    pending = list(dict.fromkeys(cluster_ids))
+    previous_states = {c: ClusterState.UNKNOWN for c in pending}
+    clusters = {}
+    exceptions = []
+    wait_seconds = _MIN_WAIT_SECONDS
+    deadline = time.monotonic() + timeout if timeout is not None else None
 
     while True:
-        time.sleep(wait_seconds)
+        if len(pending) > 1:
+            listed = {
+                c["cluster_id"]: c for c in (cluster_list() or {}).get("clusters", [])
+            }
+            current = [listed.get(c) or cluster_get(c) for c in pending]
+        else:
+            current = [cluster_get(c) for c in pending]
+
+        changed = False
+        for cluster_id, cluster in zip(list(pending), current):
+            clusters[cluster_id] = cluster
+            state = ClusterState[cluster["state"]]
+            # only log out if it's changed to reduce the log output
+            if previous_states[cluster_id] != state:
+                _logger.info(f"The cluster_id {cluster_id} state: {state.name}")
+                previous_states[cluster_id] = state
+                changed = True
+
+            try:
+                if _cluster_state_reached(cluster, cluster_state):
+                    pending.remove(cluster_id)
+            except Exception as e:
+                exceptions.append(str(e))
+                pending.remove(cluster_id)
+
+        if not pending:
+            break
 
-        cluster = cluster_get(cluster_id)
+        if changed:
+            wait_seconds = _MIN_WAIT_SECONDS
+        else:
+            wait_seconds = min(wait_seconds * _WAIT_BACKOFF, max_wait_seconds)
 
-        state = ClusterState[cluster["state"]]
-        # only log out if it's changed to reduce the log output
-        if previous_state != state:
-            _logger.info(f"The cluster_id {cluster_id} state: {state.name}")
-            previous_state = state
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                msg = f"Timed out waiting for the cluster_ids {pending} to reach the state: {cluster_state.name}"
+                _logger.error(msg)
+                raise TimeoutError(msg)
+            wait_seconds = min(wait_seconds, remaining)
 
-        if state == ClusterState.ERROR:
-            msg = f"The cluster_id {cluster_id} is in error state: {cluster['state_message']}"
-            _logger.error(msg)
-            raise Exception(msg)
+        time.sleep(wait_seconds)
 
-        elif state == ClusterState.TERMINATED and cluster_state == ClusterState.RUNNING:
-            msg = f"The cluster_id {cluster_id} {ClusterState.TERMINATED.name}: {cluster['state_message']}"
-            _logger.error(msg)
-            raise Exception(msg)
+    if exceptions:
+        raise Exception("\n".join(exceptions))
 
-        elif state == cluster_state:
-            break
+    return clusters
+
+
+def cluster_wait_until_state(
+    cluster_id: str,
+    cluster_state: ClusterState,
+    wait_seconds: int = _MAX_WAIT_SECONDS,
+    timeout: float = None,
+):
+    """
+    cluster_id:str                  the cluster to wait for
+    cluster_state:ClusterState      the state to wait for, RUNNING or TERMINATED
+    wait_seconds:int=10             longest seconds between checking the cluster state
+    timeout:float=None              seconds to wait before raising a TimeoutError
+
+    Blocks until the cluster reaches the state, see clusters_wait_until_state.
+    """
+    clusters_wait_until_state(
+        [cluster_id], cluster_state, max_wait_seconds=wait_seconds, timeout=timeout
+    )
 
 
 def cluster_has_tag(cluster: dict, tag_key: str, tag_value: str):
@@ -1,38 +1,157 @@
-from .api_service import ApiService, autobricks_logging
-from ._decode_utils import base64_decode, format_path_for_os
-import base64
+from .api_service import (
+    shared_api_service,
+    shared_async_api_service,
+    autobricks_logging,
+)
+from ._decode_utils import base64_decode, base64_encode, format_path_for_os
+from ._common import run_all, status_report, raise_failed
 import os
 import fnmatch
+import json
+import time
+import threading
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 
 _logger = autobricks_logging.get_logger(__name__)
 
 endpoint = "dbfs"
 
+# the api limits blocks, puts and reads to 1mb
+_MAX_BLOCK_SIZE = 1024 * 1024
+_CHECKPOINT_EXTENSION = ".dbfs-checkpoint"
 
-_api_service = ApiService()
 
+_api_service = shared_api_service
+_async_api_service = shared_async_api_service
 
-def dbfs_upload(from_path: str, to_path: str, overwrite: bool = True):
-    # Create a handle that will be used to add blocks
-    data = {"path": to_path, "overwrite": "true"}
 
-    handle = _api_service.api_post(endpoint, "create", data)["handle"]
+def dbfs_upload(
+    from_path: str, to_path: str, overwrite: bool = True, resumable: bool = False
+):
+    """
+    from_path:str           local path of the file to upload
+    to_path:str             dbfs path to upload the file to
+    overwrite:bool=True     overwrite the file if it exists
+    resumable:bool=False    checkpoint the upload so that a failed upload can be resumed
+
+    Uploads a file to dbfs. When resumable the upload handle and uploaded offset are
+    recorded in a checkpoint file next to the local file after every block, calling
+    it again after a failure continues from the checkpoint. The uploaded file size
+    is verified against dbfs once it's complete.
+    """
+    if resumable:
+        return _dbfs_upload_resumable(from_path, to_path, overwrite)
 
     with open(from_path, "rb") as f:
-        for block in _read_file_block(f):
-            # data = block.encode("utf-8")
-            data = base64.b64encode(block)
-            data = {"handle": handle, "data": data.decode()}
-            _api_service.api_post(endpoint, "add-block", data)
+        blocks = _read_file_block(f)
+        block = next(blocks, b"")
+        next_block = next(blocks, None)
+
+        # files that fit in a single block are uploaded in one request
+        if next_block is None:
+            return dbfs_put(to_path, block, overwrite)
+
+        # Create a handle that will be used to add blocks
+        data = {"path": to_path, "overwrite": overwrite}
+        handle = _api_service.api_post(endpoint, "create", data)["handle"]
+
+        # blocks are read and encoded one at a time so only a block is held in memory
+        for block in chain([block, next_block], blocks):
+            dbfs_add_block(handle, block)
 
     # close the handle to finish uploading
     data = {"handle": handle}
     return _api_service.api_post(endpoint, "close", data)
 
 
+def _dbfs_upload_resumable(from_path: str, to_path: str, overwrite: bool = True):
+    checkpoint_path = _checkpoint_path(from_path)
+    stat = os.stat(from_path)
+    source = {
+        "from_path": os.path.abspath(from_path),
+        "to_path": to_path,
+        "file_size": stat.st_size,
+        "modification_time": stat.st_mtime,
+    }
+
+    if stat.st_size <= _MAX_BLOCK_SIZE:
+        with open(from_path, "rb") as f:
+            response = dbfs_put(to_path, f.read(), overwrite)
+        _verify_file_size(to_path, stat.st_size)
+        return response
+
+    checkpoint = _load_checkpoint(checkpoint_path, source)
+    resume_offset = checkpoint.get("offset", 0)
+    if checkpoint:
+        _logger.info(f"Resuming upload of {from_path} from offset {resume_offset}")
+
+    def _new_handle():
+        data = {"path": to_path, "overwrite": overwrite}
+        handle = _api_service.api_post(endpoint, "create", data)["handle"]
+        return {**source, "handle": handle, "offset": 0}
+
+    def _add_blocks_and_close(checkpoint: dict):
+        with open(from_path, "rb") as f:
+            f.seek(checkpoint["offset"])
+            for block in _read_file_block(f):
+                dbfs_add_block(checkpoint["handle"], block)
+                checkpoint["offset"] += len(block)
+                _save_checkpoint(checkpoint_path, checkpoint)
+
+        # close the handle to finish uploading
+        data = {"handle": checkpoint["handle"]}
+        return _api_service.api_post(endpoint, "close", data)
+
+    if not checkpoint:
+        checkpoint = _new_handle()
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+    try:
+        response = _add_blocks_and_close(checkpoint)
+    except Exception:
+        # a resumed handle that can't take any blocks has expired so start again
+        if not resume_offset or checkpoint["offset"] != resume_offset:
+            raise
+        _logger.info(f"Upload handle for {from_path} has expired, restarting upload")
+        checkpoint = _new_handle()
+        _save_checkpoint(checkpoint_path, checkpoint)
+        response = _add_blocks_and_close(checkpoint)
+
+    _remove_checkpoint(checkpoint_path)
+    _verify_file_size(to_path, stat.st_size)
+
+    return response
+
+
+def dbfs_put(path: str, contents: bytes, overwrite: bool = True):
+    data = {
+        "path": path,
+        "contents": base64_encode(contents),
+        "overwrite": overwrite,
+    }
+    return _api_service.api_post(endpoint, "put", data)
+
+
 def dbfs_upload_files(
-    file_match: str, from_path: str, to_path: str, overwrite: bool = True
+    file_match: str,
+    from_path: str,
+    to_path: str,
+    overwrite: bool = True,
+    max_workers: int = 1,
+    raise_errors: bool = True,
 ):
+    """
+    file_match:str          filename pattern of the files to upload
+    from_path:str           local directory to search for the files
+    to_path:str             dbfs directory to upload the files to
+    overwrite:bool=True     overwrite existing files
+    max_workers:int=1       number of files uploaded concurrently
+    raise_errors:bool=True  raise an exception once all the files are uploaded if any failed
+
+    Uploads all the matching files, each with its own upload handle, and returns
+    a report with the status of every file and the aggregate throughput.
+    """
     _logger.info(
         f"Uploading files from {from_path} with filename matching {file_match} to dbfs {to_path}"
     )
@@ -41,13 +160,47 @@ def dbfs_upload_files(
     if not files:
         files = []
 
-    _logger.info(f"{len(files)} files will be upload with overwrite={overwrite}")
+    _logger.info(
+        f"{len(files)} files will be upload with overwrite={overwrite} max_workers={max_workers}"
+    )
 
-    for f in files:
+    def _upload(f: str):
         filename = os.path.basename(f)
+        to_file_path = f"{to_path}/{filename}"
+        result = {"from_path": f, "to_path": to_file_path, "bytes": 0}
+
+        _logger.info(f"{f} => {to_file_path}")
+        start = time.time()
+        try:
+            result["bytes"] = os.path.getsize(f)
+            dbfs_upload(f, to_file_path, overwrite)
+            result["status"] = "succeeded"
+        except Exception as e:
+            msg = f"Failed to upload {f} => {to_file_path} due to - {e}"
+            _logger.error(msg)
+            result["status"] = "failed"
+            result["error"] = msg
+        result["seconds"] = time.time() - start
+
+        return result
+
+    start = time.time()
+    results = run_all(_upload, files, max_workers)
+    seconds = time.time() - start
+
+    total_bytes = sum(r["bytes"] for r in results if r["status"] == "succeeded")
+    response = status_report(results, ["succeeded", "failed"], "files")
+    response["bytes"] = total_bytes
+    response["seconds"] = seconds
+    response["bytes_per_second"] = total_bytes / seconds if seconds else 0
+    _logger.info(
+        f"Uploaded {response['succeeded']} files, {response['failed']} failed, {total_bytes} bytes in {seconds:.2f}s"
+    )
 
-        _logger.info(f"{f} => {to_path}/{filename}")
-        dbfs_upload(f, f"{to_path}/{filename}", overwrite)
+    if raise_errors:
+        raise_failed(results)
+
+    return response
 
 
 def dbfs_delete_file(path: str, recursive: bool = True):
@@ -80,33 +233,151 @@ def dbfs_read(path: str, offset: int, length: int):
     return _api_service.api_get(endpoint, "read", data)
 
 
-def dbfs_download(from_path: str, to_path: str):
+async def dbfs_read_async(path: str, offset: int, length: int):
+    data = {"path": path, "offset": offset, "length": length}
+    return await _async_api_service.api_get(endpoint, "read", data)
+
+
+def dbfs_add_block(handle: int, block: bytes):
+    data = {"handle": handle, "data": base64_encode(block)}
+    return _api_service.api_post(endpoint, "add-block", data)
+
+
+async def dbfs_add_block_async(handle: int, block: bytes):
+    data = {"handle": handle, "data": base64_encode(block)}
+    return await _async_api_service.api_post(endpoint, "add-block", data)
+
+
+def dbfs_download(
+    from_path: str, to_path: str, max_workers: int = 1, resumable: bool = False
+):
+    """
+    from_path:str           dbfs path of the file to download
+    to_path:str             local path to download the file to
+    max_workers:int=1       number of 1mb ranges downloaded concurrently
+    resumable:bool=False    checkpoint the download so that a failed download can be resumed
+
+    Downloads a file from dbfs. The size of the file is read first so that the
+    local file can be preallocated and the 1mb ranges fetched in parallel and
+    written at their offset. The downloaded length is verified against the size.
+    When resumable the completed ranges are recorded in a checkpoint file next to
+    the local file, calling it again after a failure only fetches the missing ranges.
+    """
     to_os_path = format_path_for_os(to_path)
 
     _logger.info(f"Starting to download file from dbfs: {from_path} => {to_os_path}")
 
-    offset = 0
-    # api limited to 1mb chunks
-    read_chunk = 1024
-    total_bytes = 0
-    with open(to_os_path, "wb") as file:
-        while True:
-            response = dbfs_read(from_path, offset, read_chunk)
-            offset += read_chunk
-            bytes_read = response["bytes_read"]
-            total_bytes += bytes_read
-            data = response["data"]
-            data = base64_decode(data)
+    status = dbfs_get_status(from_path)
+    file_size = status["file_size"]
+    lock = threading.Lock()
+    completed = {}
+
+    checkpoint_path = _checkpoint_path(to_os_path) if resumable else None
+    if resumable and os.path.exists(to_os_path):
+        source = {
+            "from_path": from_path,
+            "file_size": file_size,
+            "modification_time": status.get("modification_time"),
+        }
+        checkpoint = _load_checkpoint(checkpoint_path, source)
+        completed = {
+            offset: length for offset, length in checkpoint.get("completed", [])
+        }
+        if completed:
+            _logger.info(
+                f"Resuming download of {from_path} with {len(completed)} ranges already downloaded"
+            )
+
+    offsets = [o for o in range(0, file_size, _MAX_BLOCK_SIZE) if o not in completed]
+
+    with open(to_os_path, "r+b" if completed else "wb") as file:
+        if not completed:
+            file.truncate(file_size)
+
+        def _download_range(offset: int):
+            response = dbfs_read(from_path, offset, _MAX_BLOCK_SIZE)
+            data = base64_decode(response["data"]) if response["bytes_read"] else b""
+            with lock:
+                file.seek(offset)
+                file.write(data)
+                completed[offset] = len(data)
+                if checkpoint_path:
+                    file.flush()
+                    checkpoint = {
+                        "from_path": from_path,
+                        "file_size": file_size,
+                        "modification_time": status.get("modification_time"),
+                        "completed": sorted(completed.items()),
+                    }
+                    _save_checkpoint(checkpoint_path, checkpoint)
+
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(_download_range, offsets))
+        else:
+            for offset in offsets:
+                _download_range(offset)
+
+    # the transfer is finished so a retry should always start again
+    if checkpoint_path:
+        _remove_checkpoint(checkpoint_path)
+
+    total_bytes = sum(completed.values())
+    if total_bytes != file_size:
+        msg = f"Downloaded {total_bytes} bytes from {from_path} but expected {file_size} bytes"
+        _logger.error(msg)
+        raise Exception(msg)
+
+    _logger.info(f"Finished downloading {str(total_bytes)} bytes")
 
-            file.write(data)
 
-            if bytes_read < read_chunk:
-                break
+def _verify_file_size(path: str, file_size: int):
+    dbfs_file_size = dbfs_get_status(path)["file_size"]
+    if dbfs_file_size != file_size:
+        msg = (
+            f"Uploaded {dbfs_file_size} bytes to {path} but expected {file_size} bytes"
+        )
+        _logger.error(msg)
+        raise Exception(msg)
 
-    _logger.info(f"Finished downloading {str(total_bytes)} bytes")
+
+def _checkpoint_path(path: str):
+    return f"{path}{_CHECKPOINT_EXTENSION}"
+
+
+def _load_checkpoint(checkpoint_path: str, source: dict):
+    """
+    Returns the checkpoint if it exists and was taken for the same source file,
+    otherwise an empty checkpoint so the transfer starts from the beginning.
+    """
+    if not os.path.exists(checkpoint_path):
+        return {}
+
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        checkpoint: dict = json.load(f)
+
+    if any(checkpoint.get(k) != v for k, v in source.items()):
+        _logger.info(f"Checkpoint {checkpoint_path} is out of date, ignoring it")
+        return {}
+
+    return checkpoint
+
+
+def _save_checkpoint(checkpoint_path: str, checkpoint: dict):
+    # write then replace so a failure can't leave a partial checkpoint
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _remove_checkpoint(checkpoint_path: str):
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
 
 
-def _read_file_block(file_object, chunk_size=1024):
+def _read_file_block(file_object, chunk_size: int = None):
+    chunk_size = chunk_size or _MAX_BLOCK_SIZE
     while True:
         data = file_object.read(chunk_size)
         if not data:
@@ -1,14 +1,45 @@
-from .api_service import ApiService, autobricks_logging
+from .api_service import (
+    shared_api_service,
+    shared_async_api_service,
+    autobricks_logging,
+)
 from enum import Enum
 from typing import Union, List
-from ._common import get_metadata_format, load_format, tags_exist_in
+from ._common import (
+    get_metadata_format,
+    load_format,
+    tags_exist_in,
+    run_all,
+    status_report,
+    raise_failed,
+)
+from ._job_run_monitor import (
+    JobRunMonitor,
+    FINAL_LIFE_CYCLE_STATES,
+    DEFAULT_MIN_POLL_SECONDS,
+    DEFAULT_MAX_POLL_SECONDS,
+)
+from concurrent.futures import ThreadPoolExecutor
 import os
+import asyncio
+import math
+import threading
+import time
 
 _logger = autobricks_logging.get_logger(__name__)
 
 endpoint = "jobs"
 _JOBS_API_VERSION = "2.1"
-_api_service = ApiService()
+# the api maximum so that sweeping every job takes as few requests as possible
+_JOBS_LIST_LIMIT = 100
+_RUNS_LIST_LIMIT = 25
+_api_service = shared_api_service
+_async_api_service = shared_async_api_service
+
+# job names to job ids, filled on demand by job_ids
+_job_ids = {}
+_job_ids_loaded = False
+_job_ids_lock = threading.Lock()
 
 
 class JobRunException(Exception):
@@ -46,12 +77,100 @@ def job_run_get(run_id: int):
     return response
 
 
-def job_runs_list(
+async def job_run_get_async(run_id: int):
+    params = {"run_id": run_id}
+    try:
+        response = await _async_api_service.api_get(
+            endpoint, "runs/get", params=params, api_version=_JOBS_API_VERSION
+        )
+    except Exception:
+        raise JobRunException(run_id)
+
+    return response
+
+
+async def job_run_wait_async(run_id: int, poll_seconds: float = 10):
+    """
+    run_id:int              the run to wait for
+    poll_seconds:float=10   seconds between polling the run state
+
+    Polls the run until it has reached a final life cycle state and returns the run.
+    Gathering many of these lets a single process wait on hundreds of runs.
+    """
+    while True:
+        run = await job_run_get_async(run_id)
+        life_cycle_state = run.get("state", {}).get("life_cycle_state")
+        if life_cycle_state in FINAL_LIFE_CYCLE_STATES:
+            _logger.info(f"run_id={run_id} finished in state {life_cycle_state}")
+            return run
+
+        await asyncio.sleep(poll_seconds)
+
+
+def _runs_list_pages(params: dict):
+    """
+    Generator of the pages of runs/list following has_more either by the
+    next_page_token or by the offset.
+    """
+    params = dict(params)
+    params.setdefault("limit", _RUNS_LIST_LIMIT)
+    params.setdefault("offset", 0)
+    while True:
+        response = _api_service.api_get(
+            endpoint, "runs/list", params=params, api_version=_JOBS_API_VERSION
+        )
+        yield response
+
+        if not response.get("has_more"):
+            break
+
+        if response.get("next_page_token"):
+            params.pop("offset", None)
+            params["page_token"] = response["next_page_token"]
+        else:
+            params["offset"] += params["limit"]
+
+
+def _job_runs_active():
+    return [
+        run
+        for page in _runs_list_pages({"active_only": True})
+        for run in page.get("runs", [])
+    ]
+
+
+def job_run_monitor(
+    run_ids: List[int],
+    on_transition=None,
+    min_poll_seconds: float = DEFAULT_MIN_POLL_SECONDS,
+    max_poll_seconds: float = DEFAULT_MAX_POLL_SECONDS,
+):
+    """
+    run_ids:List[int]               the runs to monitor
+    on_transition:callable=None     called with each transition as the runs change state
+    min_poll_seconds:float=5        seconds between polls after a run changes state
+    max_poll_seconds:float=60       longest seconds between polls while nothing changes
+
+    Returns a monitor that polls many runs together using one active runs listing per
+    poll. Call wait() to block until they've all finished or iterate over the monitor,
+    with for or async for, to get each state transition as it happens.
+    """
+    return JobRunMonitor(
+        _job_runs_active,
+        job_run_get,
+        run_ids,
+        on_transition=on_transition,
+        min_poll_seconds=min_poll_seconds,
+        max_poll_seconds=max_poll_seconds,
+    )
+
+
+def _runs_list_params(
     active_only: bool = False,
     completed_only: bool = False,
     job_id: int = None,
     offset: int = 0,
-    limit: int = 25,
+    limit: int = _RUNS_LIST_LIMIT,
     run_type: JobRunType = JobRunType.JOB_RUN,
     expand_tasks=False,
     start_time_from: int = None,
@@ -63,32 +182,277 @@ def job_runs_list(
         "job_id": job_id,
         "offset": offset,
         "limit": limit,
-        "run_type": run_type.value,
+        "run_type": run_type.value if run_type else None,
         "expand_tasks": expand_tasks,
         "start_time_from": start_time_from,
         "start_time_to": start_time_to,
     }
-    params = {k: v for k, v in params.items() if v is not None}
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def job_runs_list(
+    active_only: bool = False,
+    completed_only: bool = False,
+    job_id: int = None,
+    offset: int = 0,
+    limit: int = 25,
+    run_type: JobRunType = JobRunType.JOB_RUN,
+    expand_tasks=False,
+    start_time_from: int = None,
+    start_time_to: int = None,
+):
+    params = _runs_list_params(
+        active_only,
+        completed_only,
+        job_id,
+        offset,
+        limit,
+        run_type,
+        expand_tasks,
+        start_time_from,
+        start_time_to,
+    )
 
     response = _api_service.api_get(
-        endpoint, "runs/list", api_version=_JOBS_API_VERSION
+        endpoint, "runs/list", params=params, api_version=_JOBS_API_VERSION
     )
 
     return response
 
 
-def job_run_delete(run_id: int):
+def _prefetch(pages):
+    """
+    Iterates over the pages getting the next page in the background while the
+    current page is being used.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(next, pages, None)
+        while True:
+            page = future.result()
+            if page is None:
+                return
+            future = executor.submit(next, pages, None)
+            yield page
+
+
+def _time_windows(start_time_from: int, start_time_to: int, windows: int):
+    """
+    Splits the start time range into windows that don't overlap, latest first
+    to match the order of the runs list.
+    """
+    size = math.ceil((start_time_to - start_time_from + 1) / windows)
+    bounds = [
+        (start, min(start + size - 1, start_time_to))
+        for start in range(start_time_from, start_time_to + 1, size)
+    ]
+    return list(reversed(bounds))
+
+
+def job_runs_iter(
+    active_only: bool = False,
+    completed_only: bool = False,
+    job_id: int = None,
+    limit: int = _RUNS_LIST_LIMIT,
+    run_type: JobRunType = JobRunType.JOB_RUN,
+    expand_tasks=False,
+    start_time_from: int = None,
+    start_time_to: int = None,
+    windows: int = 1,
+    max_workers: int = 1,
+):
+    """
+    active_only:bool=False              only runs that are active
+    completed_only:bool=False           only runs that have completed
+    job_id:int=None                     only runs of this job
+    limit:int=25                        number of runs to return in a single API call
+    run_type:JobRunType=JOB_RUN         only runs of this type, None for all types
+    expand_tasks:bool=False             include the task details of the runs
+    start_time_from:int=None            only runs that started at or after this epoch time in milliseconds
+    start_time_to:int=None              only runs that started at or before this epoch time in milliseconds
+    windows:int=1                       number of time windows the start time range is split into
+    max_workers:int=1                   number of time windows fetched concurrently
+
+    Generator of the runs that follows every page of the runs list, getting the next
+    page in the background while the current page is used. Large histories can be
+    split into windows of the start time range that are fetched concurrently, this needs
+    start_time_from, start_time_to defaults to now. The runs are yielded latest first.
+    """
+    params = _runs_list_params(
+        active_only=active_only,
+        completed_only=completed_only,
+        job_id=job_id,
+        limit=limit,
+        run_type=run_type,
+        expand_tasks=expand_tasks,
+        start_time_from=start_time_from,
+        start_time_to=start_time_to,
+    )
+
+    if windows <= 1:
+        for page in _prefetch(_runs_list_pages(params)):
+            yield from page.get("runs", [])
+        return
+
+    if start_time_from is None:
+        raise ValueError("start_time_from is required to split the runs into windows")
+    if start_time_to is None:
+        start_time_to = int(time.time() * 1000)
+    if start_time_from > start_time_to:
+        raise ValueError(
+            f"start_time_from {start_time_from} is after start_time_to {start_time_to}"
+        )
+
+    def _window_runs(window: tuple):
+        window_params = dict(params)
+        window_params["start_time_from"], window_params["start_time_to"] = window
+        return [
+            run
+            for page in _runs_list_pages(window_params)
+            for run in page.get("runs", [])
+        ]
+
+    bounds = _time_windows(start_time_from, start_time_to, windows)
+    _logger.info(
+        f"listing runs in {len(bounds)} windows with max_workers={max_workers}"
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for runs in executor.map(_window_runs, bounds):
+            yield from runs
+
+
+def _job_run_delete(run_id: int):
     data = {"run_id": run_id}
     try:
         response = _api_service.api_post(
             endpoint, "runs/delete", data, api_version=_JOBS_API_VERSION
         )
     except Exception:
+        raise JobRunException(run_id)
+
+    return response
+
+
+def job_run_delete(run_id: int):
+    try:
+        response = _job_run_delete(run_id)
+    except JobRunException:
         response = {}
 
     return response
 
 
+def _run_states(run: dict):
+    state = run.get("state", {})
+    return {state.get("life_cycle_state"), state.get("result_state")}
+
+
+def job_runs_purge(
+    job_id: int = None,
+    older_than_days: float = None,
+    states: List[str] = None,
+    run_type: JobRunType = JobRunType.JOB_RUN,
+    max_workers: int = 1,
+    raise_errors: bool = True,
+):
+    """
+    job_id:int=None                     only delete the runs of this job
+    older_than_days:float=None          only delete runs that started more than this many days ago
+    states:List[str]=None               only delete runs with one of these life cycle or result states e.g. ["FAILED", "CANCELED"]
+    run_type:JobRunType=JOB_RUN         only delete runs of this type, None for all types
+    max_workers:int=1                   number of runs deleted concurrently
+    raise_errors:bool=True              raise an exception once all the runs are deleted if any failed
+
+    Deletes the completed runs that match the filters. The runs are listed in full before
+    any are deleted so that deleting doesn't move the pages of the listing. Listed runs
+    that don't have one of the states are skipped. The deletes go through the api rate
+    limiter. Returns the counts of the runs deleted, skipped and failed.
+    """
+    start_time_to = None
+    if older_than_days is not None:
+        start_time_to = int((time.time() - older_than_days * 24 * 60 * 60) * 1000)
+
+    run_ids = []
+    skipped = 0
+    for run in job_runs_iter(
+        completed_only=True,
+        job_id=job_id,
+        run_type=run_type,
+        start_time_to=start_time_to,
+    ):
+        if states and not _run_states(run).intersection(states):
+            skipped += 1
+        else:
+            run_ids.append(run["run_id"])
+
+    _logger.info(
+        f"Purging {len(run_ids)} runs, skipping {skipped} with max_workers={max_workers}"
+    )
+
+    def _delete(run_id: int):
+        try:
+            _job_run_delete(run_id)
+            return {"run_id": run_id, "status": "deleted"}
+        except JobRunException as e:
+            _logger.error(e.message)
+            return {"run_id": run_id, "status": "failed", "error": e.message}
+
+    results = run_all(_delete, run_ids, max_workers)
+
+    response = status_report(results, ["deleted", "failed"])
+    response["skipped"] = skipped
+    _logger.info(
+        f"Purged runs deleted {response['deleted']}, skipped {response['skipped']} and failed {response['failed']}"
+    )
+
+    if raise_errors:
+        raise_failed(results)
+
+    return response
+
+
+def job_ids(refresh: bool = False):
+    """
+    refresh:bool=False  list the jobs again even if they're cached
+
+    Returns a dictionary of job names to job ids. The first call lists every job in one
+    paginated sweep and the names are then cached for the process. The cache is kept up
+    to date by job_create, job_delete, job_reset and job_update and is cleared with
+    job_ids_reset. Where names are duplicated the first job listed is used.
+    """
+    global _job_ids_loaded
+
+    with _job_ids_lock:
+        if refresh or not _job_ids_loaded:
+            ids = {}
+            for job in jobs_list():
+                ids.setdefault(job.get("settings", {}).get("name"), job["job_id"])
+            _job_ids.clear()
+            _job_ids.update(ids)
+            _job_ids_loaded = True
+            _logger.info(f"Cached the job ids of {len(ids)} jobs")
+
+        return dict(_job_ids)
+
+
+def job_ids_reset():
+    """
+    Clears the cache of job names to job ids so the next lookup lists the jobs again.
+    """
+    global _job_ids_loaded
+
+    with _job_ids_lock:
+        _job_ids.clear()
+        _job_ids_loaded = False
+
+
+def _cache_job_id(name: str, job_id: int):
+    with _job_ids_lock:
+        for cached_name in [n for n, i in _job_ids.items() if i == job_id]:
+            del _job_ids[cached_name]
+        if name and job_id:
+            _job_ids.setdefault(name, job_id)
+
+
 def job_create(job: dict):
     name = job.get("name", "Unknown")
     try:
@@ -98,6 +462,7 @@ def job_create(job: dict):
     except Exception:
         raise JobException(name)
 
+    _cache_job_id(job.get("name"), response.get("job_id"))
     return response
 
 
@@ -110,6 +475,7 @@ def job_reset(job: dict):
     except Exception:
         raise JobException(name)
 
+    _cache_job_id(job.get("new_settings", {}).get("name"), job.get("job_id"))
     return response
 
 
@@ -122,6 +488,7 @@ def job_delete(job_id: int):
     except Exception:
         raise JobException(job_id)
 
+    _cache_job_id(None, job_id)
     return response
 
 
@@ -134,6 +501,9 @@ def job_update(job: dict):
     except Exception:
         raise JobException(name)
 
+    new_name = job.get("new_settings", {}).get("name")
+    if new_name:
+        _cache_job_id(new_name, job.get("job_id"))
     return response
 
 
@@ -162,10 +532,80 @@ def job_get_by_name(name: str, expand_tasks: bool = False):
     return response.get("jobs")
 
 
-def job_get_id(name: str):
+async def job_get_by_id_async(job_id: int):
+    params = {"job_id": job_id}
+
+    try:
+        response = await _async_api_service.api_get(
+            endpoint, "get", api_version=_JOBS_API_VERSION, params=params
+        )
+    except Exception:
+        raise JobException(job_id)
+
+    return response
+
+
+async def job_get_by_name_async(name: str, expand_tasks: bool = False):
+    params = {"name": name, "expand_tasks": expand_tasks}
+    try:
+        response = await _async_api_service.api_get(
+            endpoint, "list", api_version=_JOBS_API_VERSION, params=params
+        )
+    except Exception:
+        raise JobException(name)
+
+    return response.get("jobs")
+
+
+def jobs_list(expand_tasks: bool = False, limit: int = _JOBS_LIST_LIMIT):
+    """
+    expand_tasks:bool=False     include the task and cluster details in the job settings
+    limit:int=100               number of jobs to return in a single API call, at most 100
+
+    Generator of every job in the workspace following the pages of the jobs list.
+    """
+    params = {"expand_tasks": expand_tasks, "limit": limit, "offset": 0}
+    while True:
+        try:
+            response = _api_service.api_get(
+                endpoint, "list", api_version=_JOBS_API_VERSION, params=params
+            )
+        except Exception:
+            raise JobException("list")
+
+        yield from response.get("jobs", [])
+
+        if not response.get("has_more"):
+            break
+
+        if response.get("next_page_token"):
+            params.pop("offset", None)
+            params["page_token"] = response["next_page_token"]
+        else:
+            params["offset"] += limit
+
+
+def job_get_id(name: str, use_cache: bool = True):
+    """
+    name:str                the name of the job
+    use_cache:bool=True     look the job up in the cache of job ids filled by job_ids
+
+    Returns the job id of the job with the name or None if there isn't one. Names that
+    aren't in the cache are looked up by name in case the job was created elsewhere.
+    With use_cache the first lookup in the process lists every job in the workspace
+    to fill the cache, in pages of 100, so a single lookup in a workspace with many
+    jobs costs several requests. Set use_cache=False to only look up the one name.
+    """
+    if use_cache:
+        job_id = job_ids().get(name)
+        if job_id:
+            return job_id
+
     jobs = job_get_by_name(name)
     if jobs:
         job_id = jobs[0].get("job_id", False)
+        if use_cache:
+            _cache_job_id(name, job_id)
         return job_id
     else:
         return None
@@ -205,9 +645,8 @@ def job_create_or_replace(job: dict):
         job_create(job=job)
 
 
-def job_import_jobs(
-    from_path: str, tags: Union[str, List[str], None] = None, recreate: bool = False
-):
+def _load_jobs(from_path: str, tags: Union[str, List[str], None] = None):
+    jobs = []
     for root, _, files in os.walk(from_path):
         config_files = [f for f in files if get_metadata_format(f)]
 
@@ -221,7 +660,131 @@ def job_import_jobs(
             in_tags = data.get("tags")
 
             if tags_exist_in(tags, in_tags):
-                if recreate:
-                    job_recreate(data)
-                else:
-                    job_create_or_replace(data)
+                jobs.append(data)
+
+    return jobs
+
+
+# settings that databricks adds to the jobs when they aren't given
+_SERVER_DEFAULTS = {
+    "format": "MULTI_TASK",
+    "max_concurrent_runs": 1,
+    "timeout_seconds": 0,
+    "run_if": "ALL_SUCCESS",
+    "source": "WORKSPACE",
+    "email_notifications": {},
+    "webhook_notifications": {},
+}
+_MISSING = object()
+
+
+def _setting(settings: dict, key: str):
+    return settings.get(key, _SERVER_DEFAULTS.get(key, _MISSING))
+
+
+def _values_match(local, remote):
+    if isinstance(local, dict):
+        return isinstance(remote, dict) and all(
+            _values_match(_setting(local, k), _setting(remote, k))
+            for k in set(local) | set(remote)
+        )
+    if isinstance(local, list):
+        return (
+            isinstance(remote, list)
+            and len(local) == len(remote)
+            and all(_values_match(lv, rv) for lv, rv in zip(local, remote))
+        )
+    return local == remote
+
+
+def _settings_match(local: dict, remote: dict):
+    """
+    Compares the local job settings with the remote settings the way jobs/update
+    applies them. Each top level field in the local definition replaces the remote
+    field so its whole value is compared, top level fields that are only on the remote
+    job are kept by the update and ignored. Settings databricks adds with their
+    default values are ignored.
+    """
+    return all(_values_match(_setting(local, k), _setting(remote, k)) for k in local)
+
+
+def job_import_jobs(
+    from_path: str,
+    tags: Union[str, List[str], None] = None,
+    recreate: bool = False,
+    bulk: bool = False,
+    max_workers: int = 1,
+    raise_errors: bool = True,
+):
+    """
+    from_path:str                               directory of job definition files
+    tags:Union[str, List[str], None]=None       only import jobs that have this or these tags
+    recreate:bool=False                         delete and create the jobs instead of updating them
+    bulk:bool=False                             list the jobs once and only update the jobs that changed
+    max_workers:int=1                           number of jobs imported concurrently in bulk mode
+    raise_errors:bool=True                      in bulk mode raise an exception once all the jobs are imported if any failed
+
+    Creates or updates the jobs defined in the files. In bulk mode all the jobs are listed
+    once and indexed by name, jobs whose remote settings already match the local definition
+    are left unchanged and the rest are imported concurrently. Bulk mode returns a report
+    with the status of every job.
+    """
+    jobs = _load_jobs(from_path, tags)
+
+    if not bulk:
+        for data in jobs:
+            if recreate:
+                job_recreate(data)
+            else:
+                job_create_or_replace(data)
+        return
+
+    remote_jobs = {}
+    for job in jobs_list(expand_tasks=True):
+        remote_jobs.setdefault(job.get("settings", {}).get("name"), job)
+    _logger.info(f"Importing {len(jobs)} jobs against {len(remote_jobs)} existing jobs")
+
+    def _import(job: dict):
+        name = job.get("name")
+        result = {"name": name}
+        remote_job = remote_jobs.get(name)
+        try:
+            if not name:
+                raise Exception("Job definition doesn't have a 'name'.")
+
+            if remote_job and recreate:
+                job_delete(job_id=remote_job["job_id"])
+                remote_job = None
+
+            if not remote_job:
+                _logger.info(f"creating new job {name}")
+                job_create(job=job)
+                result["status"] = "created"
+            elif _settings_match(job, remote_job.get("settings", {})):
+                result["status"] = "unchanged"
+            else:
+                job_id = remote_job["job_id"]
+                _logger.info(f"updating job {name} job_id={job_id}")
+                job_update(job={"new_settings": job, "job_id": job_id})
+                result["status"] = "updated"
+
+        except Exception as e:
+            msg = f"Failed to import job {name} due to - {e}"
+            _logger.error(msg)
+            result["status"] = "failed"
+            result["error"] = msg
+
+        return result
+
+    results = run_all(_import, jobs, max_workers)
+
+    statuses = ["created", "updated", "unchanged", "failed"]
+    response = status_report(results, statuses, "jobs")
+    _logger.info(
+        f"Imported jobs created {response['created']}, updated {response['updated']}, unchanged {response['unchanged']} and failed {response['failed']}"
+    )
+
+    if raise_errors:
+        raise_failed(results)
+
+    return response
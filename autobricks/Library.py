@@ -1,11 +1,11 @@
-from .api_service import ApiService, autobricks_logging
+from .api_service import shared_api_service, autobricks_logging
 from wheel_inspect import inspect_wheel
 from dataclasses import dataclass
 import os
 
 _logger = autobricks_logging.get_logger(__name__)
 
-_api_service = ApiService()
+_api_service = shared_api_service
 
 
 def library_all_cluster_statuses():
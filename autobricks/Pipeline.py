@@ -1,4 +1,4 @@
-from .api_service import ApiService, autobricks_logging
+from .api_service import shared_api_service, autobricks_logging
 from typing import Union
 from ._common import get_metadata_format, load_format
 import os
@@ -7,7 +7,7 @@ _logger = autobricks_logging.get_logger(__name__)
 
 endpoint = "pipelines"
 _PIPELINES_API_VERSION = "2.0"
-_api_service = ApiService()
+_api_service = shared_api_service
 
 
 class PipelineException(Exception):
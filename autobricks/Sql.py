@@ -5,32 +5,50 @@
     Documented databrick api
     https://docs.databricks.com/sql/api/
 """
-from .. import _logging
-from .api_service import ApiService
+from .api_service import shared_api_service, autobricks_logging, metrics
+import itertools
 import math
 import os
+import time
+import posixpath
+import threading
 import yaml
 import json
 from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import Union, List
+from typing import Union, List, Dict
 from .Workspace import (
-    workspace_dir_exists,
+    workspace_list,
     workspace_mkdirs,
-    workspace_get_folder_id,
     workspace_find_paths,
+    DEFAULT_TTL,
+)
+from ._query_catalogue import QueryCatalogue
+from ._common import (
+    MetadataFormat,
+    get_metadata_format,
+    load_format,
+    tags_exist_in,
+    run_all,
+    status_report,
+    raise_failed,
 )
-from ._common import MetadataFormat, get_metadata_format, load_format, tags_exist_in
 
 
-_logger = _logging.get_logger(__name__)
+_logger = autobricks_logging.get_logger(__name__)
 endpoint = "sql"
 _PREVIEW = True
 _API_VERSION = "2.0"
 _FOLDERS = "folders/"
+_PAGE_SIZE = 100
 
 # creates an api service that handles the authentication
-_api_service = ApiService()
+_api_service = shared_api_service
+
+# access control lists of the objects by object type and id
+_acls = {}
+_acls_lock = threading.Lock()
 
 
 class PermissionLevel(Enum):
@@ -61,7 +79,13 @@ def _get_credential_type(name: str):
         return AclCredential.group_acl
 
 
-def queries_delete(query_id: str):
+def queries_delete(query_id: str, catalogue: QueryCatalogue = None):
+    """
+    query_id:str                        id of the query to delete
+    catalogue:QueryCatalogue=None       query catalogue to remove the query from
+
+    Deletes a query.
+    """
     _logger.info(f"Delete query {query_id}")
     response = _api_service.api_delete(
         endpoint,
@@ -70,57 +94,173 @@ def queries_delete(query_id: str):
         api_version=_API_VERSION,
     )
 
+    if catalogue is not None:
+        catalogue.remove(query_id)
+
+    with _acls_lock:
+        _acls.pop(_acl_key(query_id, ObjectType.query), None)
+
     return response
 
 
-def queries(page_size: int = 10, order: str = "name", q=None):
+def _queries_page(page: int, page_size: int, order: str, q: str):
+    params = {"page_size": page_size, "page": page, "order": order, "q": q}
+    current_queries: dict = _api_service.api_get(
+        endpoint,
+        "queries",
+        preview=_PREVIEW,
+        params=params,
+        api_version=_API_VERSION,
+    )
+    current_count = current_queries.get("count", 0)
+    current_page = current_queries.get("page", 0)
+    current_page_size = current_queries.get("page_size", 0)
+    _logger.debug(
+        f"exported page {current_page} page of {current_page_size} queries out of {current_count} total queries"
+    )
+    return current_queries
+
+
+def queries_iter(
+    page_size: int = _PAGE_SIZE, order: str = "name", q=None, max_workers: int = 1
+):
     """
-    page_size:int=10    Number of queries to return in a single API call
+    page_size:int=100   Number of queries to return in a single API call
     order:str="name"    The attribute to order the queries by
     q:str=None          Query string for a full text search
+    max_workers:int=1   Number of pages fetched concurrently, 1 fetches them one after the other
 
-    Calls the api endpint tor return a list queries and their details.
-    https://docs.databricks.com/sql/api/queries-dashboards.html#operation/sql-analytics-get-queries
+    Generator of the queries that yields each page of queries as soon as it arrives so
+    that callers can start work before the last page is fetched. The first page gives
+    the total count, when max_workers > 1 the remaining pages are fetched concurrently
+    and are still yielded in order.
     """
-
-    page: int = 1
-    params = {"page_size": page_size, "page": page, "order": order, "q": q}
     _logger.info("listing queries")
 
-    current_page_size = page_size
-    page = 1
-    results = []
-
-    while True:
-        params["page"] = page
-        current_queries: dict = _api_service.api_get(
-            endpoint,
-            "queries",
-            preview=_PREVIEW,
-            params=params,
-            api_version=_API_VERSION,
-        )
-        current_count = current_queries.get("count", 0)
-        current_page = current_queries.get("page", 0)
-        current_page_size = current_queries.get("page_size", 0)
-        _logger.debug(
-            f"exported page {current_page} page of {current_page_size} queries out of {current_count} total queries"
-        )
+    first_page = _queries_page(1, page_size, order, q)
+    yield from first_page.get("results", [])
+
+    count = first_page.get("count", 0)
+    page_size = first_page.get("page_size") or page_size
+    pages = math.ceil(count / page_size)
+    remaining = range(2, pages + 1)
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for page in executor.map(
+                lambda p: _queries_page(p, page_size, order, q), remaining
+            ):
+                yield from page.get("results", [])
+    else:
+        for p in remaining:
+            yield from _queries_page(p, page_size, order, q).get("results", [])
 
-        results = results + current_queries.get("results", [])
-        _logger.debug(f"collected {len(results)} of {current_count} total queries")
 
-        expected_page_threshold = math.ceil(current_count / current_page_size)
-        if page >= expected_page_threshold:
-            break
+def queries(
+    page_size: int = _PAGE_SIZE, order: str = "name", q=None, max_workers: int = 1
+):
+    """
+    page_size:int=100   Number of queries to return in a single API call
+    order:str="name"    The attribute to order the queries by
+    q:str=None          Query string for a full text search
+    max_workers:int=1   Number of pages fetched concurrently, 1 fetches them one after the other
 
-        page += 1
+    Calls the api endpint tor return a list queries and their details.
+    https://docs.databricks.com/sql/api/queries-dashboards.html#operation/sql-analytics-get-queries
+    """
 
+    results = list(queries_iter(page_size, order=order, q=q, max_workers=max_workers))
     _logger.debug(f"exported {len(results)}")
 
     return results
 
 
+def queries_catalogue(page_size: int = _PAGE_SIZE, max_workers: int = 8):
+    """
+    page_size:int=100   Number of queries to return in a single API call
+    max_workers:int=8   Number of pages fetched concurrently
+
+    Lists every query once and returns a catalogue of them by name that's shared
+    by the import and ACL steps and kept up to date as queries are deployed.
+    """
+    catalogue = QueryCatalogue(
+        lambda: queries(page_size=page_size, max_workers=max_workers)
+    )
+    return catalogue.load()
+
+
+def _acl_entries(acl_name: Union[str, List[str]], permission: PermissionLevel):
+    if isinstance(acl_name, str):
+        acl_name = [acl_name]
+
+    return [
+        {_get_credential_type(name).value: name, "permission_level": permission.value}
+        for name in acl_name
+    ]
+
+
+def _acl_key(object_id: str, object_type: ObjectType):
+    return f"{object_type.value}/{object_id}"
+
+
+def get_acl(
+    object_id: str, object_type: ObjectType = ObjectType.query, refresh: bool = False
+):
+    """
+    object_id:str                                           the object id to get the permissions of
+    object_type:ObjectType=ObjectType.query                 the type of object
+    refresh:bool=False                                      get the permissions even if they're cached
+
+    Returns the access control list of an object. The access control lists are cached
+    for the process and kept up to date by set_acl so repeated shares don't get them again.
+    """
+    key = _acl_key(object_id, object_type)
+    with _acls_lock:
+        if not refresh and key in _acls:
+            return _acls[key]
+
+    response = _api_service.api_get(
+        endpoint,
+        f"permissions/{key}",
+        preview=_PREVIEW,
+        api_version=_API_VERSION,
+    )
+    acl = response.get("access_control_list", [])
+
+    with _acls_lock:
+        _acls[key] = acl
+
+    return acl
+
+
+def acls_reset():
+    """
+    Clears the cache of access control lists so the next lookups get them again.
+    """
+    with _acls_lock:
+        _acls.clear()
+
+
+def _acl_matches(acls: List[dict], existing: List[dict]):
+    """
+    The permissions post replaces the whole access control list so it's only skipped
+    when the existing list is exactly the requested entries. The owner's CAN_MANAGE
+    entry is kept by the post so it's ignored.
+    """
+
+    def _owner(acl: dict):
+        return (
+            acl.get("permission_level") == PermissionLevel.CAN_MANAGE.value
+            and AclCredential.user_acl.value in acl
+            and acl not in acls
+        )
+
+    def _entries(acl_list: List[dict]):
+        return {tuple(sorted(acl.items())) for acl in acl_list}
+
+    return _entries(acls) == _entries([acl for acl in existing if not _owner(acl)])
+
+
 def set_acl(
     acl_name: Union[str, List[str]],
     permission: PermissionLevel,
@@ -136,18 +276,12 @@ def set_acl(
     grants permission of an object to a list of users or groups.
     """
 
-    if isinstance(acl_name, str):
-        acl_name = [acl_name]
-
-    acls = [
-        {_get_credential_type(name).value: name, "permission_level": permission.value}
-        for name in acl_name
-    ]
-
-    function = f"permissions/{object_type.value}/{object_id}"
+    acls = _acl_entries(acl_name, permission)
+    key = _acl_key(object_id, object_type)
+    function = f"permissions/{key}"
 
     # deploy the SQL queries
-    _api_service.api_post(
+    response = _api_service.api_post(
         endpoint,
         function,
         data=acls,
@@ -155,50 +289,119 @@ def set_acl(
         api_version=_API_VERSION,
     )
 
+    with _acls_lock:
+        if isinstance(response, dict) and "access_control_list" in response:
+            _acls[key] = response["access_control_list"]
+        else:
+            _acls.pop(key, None)
+
+
+def set_acls(
+    acls: Dict[str, Union[str, List[str], tuple]],
+    permission: PermissionLevel = PermissionLevel.CAN_RUN,
+    object_type: ObjectType = ObjectType.query,
+    max_workers: int = 1,
+    raise_errors: bool = True,
+    refresh: bool = False,
+):
+    """
+    acls:Dict[str, Union[str, List[str], tuple]]            object ids to the groups or users to grant the permission to, or to a (groups or users, permission) tuple
+    permission:PermissionLevel=PermissionLevel.CAN_RUN      the permission level granted when it's not in the mapping
+    object_type:ObjectType=ObjectType.query                 the type of the objects to grant the permission on
+    max_workers:int=1                                       number of objects granted concurrently
+    raise_errors:bool=True                                  raise an exception once all the objects are done if any failed
+    refresh:bool=False                                      get the current permissions even if they're cached
+
+    Grants permissions on many objects. The current permissions of each object are
+    got once and cached, objects that already have the permissions are skipped.
+    Use refresh when the permissions may have been changed outside this process.
+    Returns a report with the status of every object.
+    """
+
+    def _set(item: tuple):
+        object_id, acl_name = item
+        object_permission = permission
+        if isinstance(acl_name, tuple):
+            acl_name, object_permission = acl_name
+
+        result = {"object_id": object_id}
+        try:
+            existing = get_acl(object_id, object_type, refresh)
+            if _acl_matches(_acl_entries(acl_name, object_permission), existing):
+                result["status"] = "skipped"
+            else:
+                set_acl(acl_name, object_permission, object_id, object_type)
+                result["status"] = "updated"
+        except Exception as e:
+            msg = f"Failed to set acl on {object_type.value} {object_id} due to - {e}"
+            _logger.error(msg)
+            result["status"] = "failed"
+            result["error"] = msg
+
+        return result
+
+    results = run_all(_set, acls.items(), max_workers)
+
+    response = status_report(results, ["updated", "skipped", "failed"], "objects")
+    _logger.info(
+        f"Set acls updated {response['updated']}, skipped {response['skipped']} and failed {response['failed']}"
+    )
+
+    if raise_errors:
+        raise_failed(results)
+
+    return response
+
+
+def _query_details(query: dict, workspace_paths: dict):
+    """
+    Returns the exported details of a query with the workspace path of its folder.
+    """
+    folder_id = query["options"]["parent"].replace(_FOLDERS, "")
+    return {
+        "id": query["id"],
+        "name": query["name"],
+        "query": query["query"],
+        "options": {"parameters": query["options"].get("parameters")},
+        "workspace_path": workspace_paths.get(folder_id, ""),
+        "tags": query["tags"],
+    }
+
 
 def queries_export_sql(
-    page_size: int = 10,
+    page_size: int = _PAGE_SIZE,
     order: str = "name",
     root_folders: Union[str, List[str], None] = None,
     q: str = None,
     tags: Union[str, List[str], None] = None,
+    max_workers: int = 1,
+    index_ttl: float = DEFAULT_TTL,
+    index_persist_path: str = None,
 ):
     """
-    page_size:int=10    Number of queries to return in a single API call
+    page_size:int=100   Number of queries to return in a single API call
     order:str="name"    The attribute to order the queries by
     q:str=None          Query string for a full text search
     tags: Union[str, List[str], None] = None  only export queries that have this or these tags
+    max_workers:int=1   Number of pages fetched concurrently
+    index_ttl:float=300     seconds before the workspace index of the query folders is crawled again
+    index_persist_path:str=None     optional local file to save and load the workspace index
 
     Takes a list of query response dictionaries and writes the name and query into smaller dictionary
     for easier handling if you just want the query and nothing else.
     """
 
-    def _lookup_workspace_path(parent: str, workspace_paths: dict):
-        id = parent.replace(_FOLDERS, "")
-        path = workspace_paths.get(id, "")
-        return path
-
-    sql_queries = queries(page_size, order=order, q=q)
-    folder_ids = [
-        s["options"]["parent"].replace(_FOLDERS, "")
-        for s in sql_queries
+    # filter the queries as the pages arrive
+    sql_queries = [
+        s
+        for s in queries_iter(page_size, order=order, q=q, max_workers=max_workers)
         if tags_exist_in(tags, s["tags"])
     ]
-    workspace_paths = workspace_find_paths(folder_ids, root_folders)
-    name_sql = {
-        s["name"]: {
-            "id": s["id"],
-            "name": s["name"],
-            "query": s["query"],
-            "options": {"parameters": s["options"].get("parameters")},
-            "workspace_path": _lookup_workspace_path(
-                s["options"]["parent"], workspace_paths
-            ),
-            "tags": s["tags"],
-        }
-        for s in sql_queries
-        if tags_exist_in(tags, s["tags"])
-    }
+    folder_ids = [s["options"]["parent"].replace(_FOLDERS, "") for s in sql_queries]
+    workspace_paths = workspace_find_paths(
+        folder_ids, root_folders, ttl=index_ttl, persist_path=index_persist_path
+    )
+    name_sql = {s["name"]: _query_details(s, workspace_paths) for s in sql_queries}
 
     _logger.debug(f"matched {len(name_sql.keys())} queries")
     return name_sql
@@ -206,96 +409,175 @@ def queries_export_sql(
 
 def queries_export_sql_files(
     to_path: str = ".",
-    page_size: int = 10,
+    page_size: int = _PAGE_SIZE,
     order: str = "name",
     root_folders: Union[str, List[str], None] = None,
     q: str = None,
     metadata_type=MetadataFormat.yaml,
     tags: Union[str, List[str], None] = None,
+    max_workers: int = 1,
+    index_ttl: float = DEFAULT_TTL,
+    index_persist_path: str = None,
 ):
     """
     to_path:str="."     Where to write the sql query files to
-    page_size:int=10    Number of queries to return in a single API call
+    page_size:int=100   Number of queries to return in a single API call
     order:str="name"    The attribute to order the queries by
     q:str=None          Query string for a full text search
     tags: Union[str, List[str], None] = None  only export queries that have this or these tags
+    max_workers:int=1   Number of pages fetched and files written concurrently
+    index_ttl:float=300     seconds before the workspace index of the query folders is crawled again
+    index_persist_path:str=None     optional local file to save and load the workspace index
 
     Takes a list of query response dictionaries and writes the query
     to a sql file at the at the to_path using the query name.
+    The files are written by a pool of max_workers as each page of queries arrives.
+    Each directory is only created once and files are only written when their
+    content has changed so that the mtimes and git diffs of the export are stable.
+    Returns a report of the number of files written and unchanged.
     """
 
-    sql_queries = queries_export_sql(
-        page_size=page_size, order=order, root_folders=root_folders, q=q, tags=tags
-    )
-    os.makedirs(os.path.abspath(to_path), exist_ok=True)
-
-    for name, details in sql_queries.items():
-        # get the workspace patg
-        relative_path = details.get("workspace_path", "")
-        del details["workspace_path"]
+    to_path = os.path.abspath(to_path)
+    os.makedirs(to_path, exist_ok=True)
+    created_dirs = {to_path}
+    exported_names = set()
 
-        # figure out the absolute path
-        relative_path = f"{to_path}/{relative_path}"
-        abs_path = os.path.abspath(relative_path)
-        os.makedirs(abs_path, exist_ok=True)
+    def _export(details: dict):
+        name = details["name"]
+        abs_path = details.pop("workspace_path")
 
         # save the sql file
-        sql_path = os.path.abspath(f"{abs_path}/{name}.sql")
+        sql_path = os.path.join(abs_path, f"{name}.sql")
         _logger.info(f"Writing sql query {name} to path {sql_path}")
         query = details["query"]
         query = query.replace("\r", "")
-        with open(sql_path, "w", encoding="utf-8") as f:
-            f.write(query)
+        written = [_write_if_changed(sql_path, query)]
 
         # save the yaml file
         details["query"] = f"./{name}.sql"
-        yaml_path = f"{abs_path}/{name}.{metadata_type.value}"
+        yaml_path = os.path.join(abs_path, f"{name}.{metadata_type.value}")
         _logger.info(f"Writing yaml query details {name} to path {yaml_path}")
         if metadata_type == metadata_type.json:
             metadata_string = json.dumps(details, indent=4)
         elif metadata_type == metadata_type.yaml:
             metadata_string = yaml.safe_dump(details, indent=4)
 
-        with open(yaml_path, "w", encoding="utf-8") as f:
-            f.write(metadata_string)
+        written.append(_write_if_changed(yaml_path, metadata_string))
+        return written
+
+    def _page_details(page: List[dict]):
+        # folders are looked up in the cached workspace index so this is cheap per page
+        folder_ids = [s["options"]["parent"].replace(_FOLDERS, "") for s in page]
+        workspace_paths = workspace_find_paths(
+            folder_ids, root_folders, ttl=index_ttl, persist_path=index_persist_path
+        )
+
+        for s in page:
+            if s["name"] in exported_names:
+                _logger.warning(f"Skipping query with duplicate name {s['name']}")
+                continue
+            exported_names.add(s["name"])
+
+            details = _query_details(s, workspace_paths)
+            abs_path = os.path.abspath(f"{to_path}/{details['workspace_path']}")
+            if abs_path not in created_dirs:
+                os.makedirs(abs_path, exist_ok=True)
+                created_dirs.add(abs_path)
+            details["workspace_path"] = abs_path
+            yield details
+
+    def _pages():
+        sql_queries = (
+            s
+            for s in queries_iter(page_size, order=order, q=q, max_workers=max_workers)
+            if tags_exist_in(tags, s["tags"])
+        )
+        while True:
+            page = list(itertools.islice(sql_queries, page_size))
+            if not page:
+                break
+            yield from _page_details(page)
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_export, _pages()))
+    else:
+        results = [_export(d) for d in _pages()]
+
+    written = sum(w for r in results for w in r)
+    response = {"written": written, "unchanged": len(results) * 2 - written}
+    _logger.info(
+        f"Exported {len(results)} queries, wrote {response['written']} files and {response['unchanged']} were unchanged"
+    )
+    return response
+
+
+def _write_if_changed(path: str, content: str):
+    """
+    Writes the content to the file unless it already has the same content.
+    Returns True if the file was written.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
 
+    return True
 
-def queries_get_query_id(name: str):
+
+def queries_get_query_id(name: str, catalogue: QueryCatalogue = None):
     """
-    name: str   name of the query
+    name: str                           name of the query
+    catalogue:QueryCatalogue=None       look the query up in this catalogue instead of searching
 
     Returns the query id of a given query object. Many operations are by id
     and id's are different across different workspace environments.
     """
 
-    sql_queries = queries(q=name)
-    try:
-        query = next(q for q in sql_queries if q.get("name").lower() == name.lower())
-    except StopIteration:
-        return None
+    if catalogue is not None:
+        query = catalogue.get(name)
+        if not query:
+            return None
+        parent = query["parent"]
+    else:
+        sql_queries = queries(q=name)
+        try:
+            query = next(
+                q for q in sql_queries if q.get("name").lower() == name.lower()
+            )
+        except StopIteration:
+            return None
+        parent = query["options"].get("parent")
 
     result = {
         name: {
             "id": query["id"],
             "data_source_id": query.get("data_source_id"),
-            "parent": query["options"].get("parent"),
+            "parent": parent,
         }
     }
 
     return result
 
 
-def queries_import_sql(metadata: dict):
+def queries_import_sql(metadata: dict, catalogue: QueryCatalogue = None):
     """
-    metadata: dict  Dictionary of information required to create a new or edit and existing query
+    metadata: dict                      Dictionary of information required to create a new or edit and existing query
+    catalogue:QueryCatalogue=None       look up existing queries in this catalogue and keep it up to date
 
     Edit the sql definition or create a new query.
     """
 
     name = metadata["name"]
+    query_id = None
     # if it's an existing query then update it
     # else create a new one!
-    existing_query = queries_get_query_id(name=name)
+    existing_query = queries_get_query_id(name=name, catalogue=catalogue)
     if existing_query:
         query_id = existing_query[name].get("id")
         function = f"queries/{query_id}"
@@ -308,15 +590,16 @@ def queries_import_sql(metadata: dict):
         if existing_query[name]["parent"] != metadata["parent"]:
             _logger.info(f"Moving query id={query_id} name={name}")
             # folders can't be moved so we have to delete the query and rename it.
-            queries_delete(query_id)
+            queries_delete(query_id, catalogue)
             existing_query = False
+            query_id = None
 
     if not existing_query:
         function = "queries"
         _logger.info(f"Creating query name={name}")
 
     # deploy the SQL queries
-    _api_service.api_post(
+    response = _api_service.api_post(
         endpoint,
         function,
         data=metadata,
@@ -324,12 +607,94 @@ def queries_import_sql(metadata: dict):
         api_version=_API_VERSION,
     )
 
+    if catalogue is not None:
+        query = {**metadata, **(response or {})}
+        query.setdefault("id", query_id)
+        if query["id"]:
+            catalogue.put(query)
+
+    return response
+
 
-def _get_folder_id(workspace_path: str):
-    if not workspace_dir_exists(workspace_path):
-        workspace_mkdirs(workspace_path)
-    folder_object_id = workspace_get_folder_id(workspace_path)
-    return folder_object_id
+def _get_folder_ids(workspace_paths: List[str], max_workers: int = 8):
+    """
+    workspace_paths: List[str]  workspace folder paths
+    max_workers:int=8           number of concurrent workspace requests
+
+    Returns a dictionary of workspace folder paths to their object ids creating any
+    folders that don't exist. Each parent folder is listed once, the missing folders
+    are created in parallel and then their parents are listed once more for the ids.
+    """
+
+    def _list_folders(parent: str):
+        try:
+            ls = workspace_list(parent)
+        except Exception:
+            # the parent doesn't exist yet
+            return {}
+        return {
+            o["path"]: o["object_id"]
+            for o in ls.get("objects", [])
+            if o["object_type"] == "DIRECTORY"
+        }
+
+    def _list_parents(paths: List[str]):
+        parents = list(dict.fromkeys(posixpath.dirname(p) for p in paths))
+        listings = dict(zip(parents, executor.map(_list_folders, parents)))
+        return {p: listings[posixpath.dirname(p)].get(p) for p in paths}
+
+    paths = list(dict.fromkeys(workspace_paths))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        folder_ids = _list_parents(paths)
+        missing = [p for p, object_id in folder_ids.items() if object_id is None]
+
+        if missing:
+            _logger.info(f"Creating {len(missing)} workspace folders")
+            # create a level at a time so parents exist before their children
+            depths = sorted({p.count("/") for p in missing})
+            for depth in depths:
+                level = [p for p in missing if p.count("/") == depth]
+                list(executor.map(workspace_mkdirs, level))
+
+            folder_ids.update(_list_parents(missing))
+
+    not_found = [p for p, object_id in folder_ids.items() if object_id is None]
+    if not_found:
+        raise Exception(f"Paths {not_found} not found in workspace directory listings")
+
+    return folder_ids
+
+
+def _share_imported(
+    results: List[dict],
+    catalogue: QueryCatalogue,
+    share_with: Union[str, List[str]],
+    permission: PermissionLevel,
+    max_workers: int,
+):
+    """
+    Grants the permission on the imported queries looking up their ids in the catalogue.
+    Queries that can't be shared are marked as failed in their import results.
+    """
+    imported = {}
+    for result in results:
+        if result["status"] != "succeeded":
+            continue
+        query = catalogue.get(result["name"])
+        if query:
+            imported[query["id"]] = result
+        else:
+            result["status"] = "failed"
+            result["error"] = f"Failed to share query {result['name']}, it wasn't found"
+
+    acls = {query_id: share_with for query_id in imported}
+    report = set_acls(acls, permission, max_workers=max_workers, raise_errors=False)
+    for acl in report["objects"]:
+        if acl["status"] == "failed":
+            result = imported[acl["object_id"]]
+            result["status"] = "failed"
+            result["error"] = acl["error"]
 
 
 def queries_import_sql_files(
@@ -337,19 +702,23 @@ def queries_import_sql_files(
     tags: Union[str, List[str], None] = None,
     share_with: Union[str, List[str], None] = None,
     permission: PermissionLevel = PermissionLevel.CAN_RUN,
+    max_workers: int = 1,
+    raise_errors: bool = True,
 ):
     """
     from_path:str    Number of queries to return in a single API call
     tags: Union[str, List[str], None] = None  only import queries that have this or these tags
     share_with = Union[str, List[str], None] Once imported to dbx then grant permission to these credentials (groups or users)
+    max_workers:int=1   number of queries imported concurrently, also used to resolve the folders and list the queries
+    raise_errors:bool=True  raise an exception once all the queries are imported if any failed
 
     Takes a directory of SQL definitions in metadata and SQL files and uploads them databrick.
     If tags are provided it will only load those queries with those tags.
     If share_with is supplied then it will set ACLS on those groups.
+    Returns a report with the status, time taken and retries of every query.
     """
 
     sql_queries = []
-    exceptions = []
     for root, _, files in os.walk(from_path):
         config_files = [f for f in files if get_metadata_format(f)]
 
@@ -370,27 +739,54 @@ def queries_import_sql_files(
                     data["query"] = f.read()
 
                 workspace_path = root.replace(from_path, "").replace("\\", "/")
-                folder_object_id = _get_folder_id(workspace_path)
-
-                data["parent"] = f"{_FOLDERS}{folder_object_id}"
-                sql_queries.append(data)
-
-    for metadata in sql_queries:
+                sql_queries.append((workspace_path, data))
+
+    # resolve all the folders once for the whole import
+    folder_ids = _get_folder_ids([p for p, _ in sql_queries], max_workers)
+    for workspace_path, data in sql_queries:
+        data["parent"] = f"{_FOLDERS}{folder_ids[workspace_path]}"
+    sql_queries = [data for _, data in sql_queries]
+
+    # list the existing queries once for both the import and the ACLs
+    catalogue = queries_catalogue(max_workers=max_workers)
+
+    def _import(metadata: dict):
+        name = metadata["name"]
+        result = {"name": name}
+        start = time.time()
+        retries = metrics.get_thread("retries")
         try:
-            queries_import_sql(metadata)
-            if share_with:
-                # set the ACL permissions
-                name = metadata["name"]
-                existing_query = queries_get_query_id(name=name)
-                query_id = existing_query[name].get("id")
-                set_acl(share_with, permission, query_id, ObjectType.query)
+            queries_import_sql(metadata, catalogue)
+            result["status"] = "succeeded"
 
         except Exception as e:
             msg = f"Failed to import query due to - {e}"
             _logger.error(msg)
             # continue trying to import the remaining queries
-            exceptions.append(msg)
+            result["status"] = "failed"
+            result["error"] = msg
+
+        result["seconds"] = time.time() - start
+        result["retries"] = metrics.get_thread("retries") - retries
+        return result
+
+    start = time.time()
+    results = run_all(_import, sql_queries, max_workers)
+
+    if share_with:
+        # set the ACL permissions of the imported queries in bulk
+        _share_imported(results, catalogue, share_with, permission, max_workers)
+    seconds = time.time() - start
+
+    response = status_report(results, ["succeeded", "failed"], "queries")
+    response["retries"] = sum(r["retries"] for r in results)
+    response["seconds"] = seconds
+    _logger.info(
+        f"Imported {response['succeeded']} queries, {response['failed']} failed in {seconds:.2f}s"
+    )
 
     # raise any exceptions that occured
-    if exceptions:
-        raise Exception("\n".join(exceptions))
+    if raise_errors:
+        raise_failed(results)
+
+    return response
@@ -1,11 +1,20 @@
-from .api_service import ApiService, autobricks_logging
+from .api_service import (
+    shared_api_service,
+    shared_async_api_service,
+    autobricks_logging,
+)
 from typing import List, Union
 
 from ._decode_utils import (
     base64_encode,
     base64_decode,
 )
+from ._workspace_index import WorkspaceIndex, DEFAULT_TTL, DEFAULT_MAX_WORKERS
 import os
+import threading
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
 
 from enum import Enum
 
@@ -14,7 +23,11 @@ _logger = autobricks_logging.get_logger(__name__)
 endpoint = "workspace"
 
 
-_api_service = ApiService()
+_api_service = shared_api_service
+_async_api_service = shared_async_api_service
+
+_workspace_indexes = {}
+_workspace_indexes_lock = threading.Lock()
 
 
 class DeployMode(Enum):
@@ -71,6 +84,34 @@ def workspace_import(
     format: Format = Format.AUTO,
     language: Language = None,
     overwrite=True,
+):
+    data = _workspace_import_data(from_path, to_path, format, language, overwrite)
+
+    _logger.info(f"workspace import {from_path} to {to_path}")
+
+    return _api_service.api_post(endpoint, "import", data)
+
+
+async def workspace_import_async(
+    from_path: str,
+    to_path: str,
+    format: Format = Format.AUTO,
+    language: Language = None,
+    overwrite=True,
+):
+    data = _workspace_import_data(from_path, to_path, format, language, overwrite)
+
+    _logger.info(f"workspace import {from_path} to {to_path}")
+
+    return await _async_api_service.api_post(endpoint, "import", data)
+
+
+def _workspace_import_data(
+    from_path: str,
+    to_path: str,
+    format: Format = Format.AUTO,
+    language: Language = None,
+    overwrite=True,
 ):
     with open(from_path, "rb") as file:
         content = base64_encode(file.read())
@@ -85,9 +126,7 @@ def workspace_import(
     if language:
         data["language"] = language.name
 
-    _logger.info(f"workspace import {from_path} to {to_path}")
-
-    return _api_service.api_post(endpoint, "import", data)
+    return data
 
 
 def workspace_delete(path: str, recursive: True):
@@ -108,6 +147,12 @@ def workspace_list(path: str):
     return _api_service.api_get(endpoint, "list", data)
 
 
+async def workspace_list_async(path: str):
+    data = {"path": path}
+    _logger.info(f"workspace listing path {path}")
+    return await _async_api_service.api_get(endpoint, "list", data)
+
+
 def workspace_mkdirs(path: str):
     data = {"path": path}
     _logger.info(f"workspace making dirs {path}")
@@ -129,42 +174,72 @@ def workspace_get_folder_id(path: str):
     return object_id
 
 
-def workspace_find_paths(
-    folder_ids: List[str], root_folders: Union[str, List[str]] = None
+def workspace_index(
+    root: str = "/",
+    ttl: float = DEFAULT_TTL,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    persist_path: str = None,
+    refresh: bool = False,
 ):
-    if not root_folders:
-        return _workspace_find_paths(folder_ids)
-    if isinstance(root_folders, str):
-        return _workspace_find_paths(folder_ids, f"/{root_folders}")
-    if isinstance(root_folders, list):
-        workpsace_paths = {}
-        for folder in root_folders:
-            paths = _workspace_find_paths(folder_ids, f"/{folder}")
-            workpsace_paths = {**workpsace_paths, **paths}
-
-        return workpsace_paths
-
+    """
+    root:str="/"            workspace directory to index
+    ttl:float=300           seconds before the index is crawled again
+    max_workers:int=8       number of directories listed concurrently
+    persist_path:str=None   optional local file to save and load the index
+    refresh:bool=False      crawl the workspace even if the index isn't stale
+
+    Returns the index of the workspace objects under the root directory by object
+    id and path. Indexes are kept for the process by root and persist_path and only
+    crawled again once older than the ttl given to this call.
+    """
+    key = (root, persist_path)
+    with _workspace_indexes_lock:
+        index = _workspace_indexes.get(key)
+        if not index:
+            index = WorkspaceIndex(workspace_list, root, ttl, max_workers, persist_path)
+            _workspace_indexes[key] = index
+
+    return index.refresh(force=refresh, ttl=ttl, max_workers=max_workers)
 
-def _workspace_find_paths(folder_ids: List[str], path="/"):
-    folder_ids = list(dict.fromkeys(folder_ids))
-    ls = workspace_list(path)
-    folder_paths = {}
-    if ls:
-        ls = ls["objects"]
 
-        folder_paths = {}
+def workspace_find_paths(
+    folder_ids: List[str],
+    root_folders: Union[str, List[str]] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    ttl: float = DEFAULT_TTL,
+    persist_path: str = None,
+):
+    """
+    folder_ids:List[str]                        workspace object ids of the folders
+    root_folders:Union[str, List[str]]=None     only index these top level folders
+    max_workers:int=8                           number of directories listed concurrently
+    ttl:float=300                               seconds before the index is crawled again
+    persist_path:str=None                       optional local file to save and load the index
+
+    Returns a dictionary of the workspace paths of the folder ids using the workspace
+    index of each root folder. With more than one root folder the persist_path is
+    suffixed with the folder name so that each index has its own file.
+    """
+    if not root_folders:
+        roots = ["/"]
+    elif isinstance(root_folders, str):
+        roots = [f"/{root_folders}"]
+    else:
+        roots = [f"/{folder}" for folder in root_folders]
 
-        for folder in ls:
-            id = folder["object_id"]
-            object_type = ObjectType(folder["object_type"])
-            path = folder["path"]
-            if str(id) in folder_ids:
-                folder_paths[str(id)] = folder["path"]
-            if object_type == ObjectType.DIRECTORY:
-                sub_folder_paths = _workspace_find_paths(folder_ids, path)
-                folder_paths = {**folder_paths, **sub_folder_paths}
+    folder_ids = list(dict.fromkeys(str(id) for id in folder_ids))
+    workpsace_paths = {}
+    for root in roots:
+        root_persist_path = persist_path
+        if persist_path and len(roots) > 1:
+            root_persist_path = f"{persist_path}.{root.strip('/').replace('/', '_')}"
+        index = workspace_index(root, ttl, max_workers, root_persist_path)
+        for id in folder_ids:
+            path = index.get_path(id)
+            if path:
+                workpsace_paths[id] = path
 
-    return folder_paths
+    return workpsace_paths
 
 
 def workspace_export(from_path: str, format: Format, to_path: str):
@@ -232,7 +307,33 @@ def workspace_notebook_exists(path: str):
     return reponse.get("object_type") == "NOTEBOOK" and reponse.get("path") == path
 
 
-def workspace_import_dir(from_path: str, to_path: str, sub_dirs: List[str] = None):
+def workspace_import_dir(
+    from_path: str,
+    to_path: str,
+    sub_dirs: List[str] = None,
+    max_workers: int = 1,
+    manifest_path: str = None,
+    delete_removed: bool = False,
+):
+    """
+    from_path:str           local directory to deploy
+    to_path:str             workspace directory to deploy to
+    sub_dirs:List[str]=None only deploy these top level sub directories
+    max_workers:int=1       number of concurrent requests, 1 deploys serially
+    manifest_path:str=None  local manifest of deployed content hashes, enables incremental deploys
+    delete_removed:bool=False   incremental only, delete deployed notebooks that no longer exist locally
+
+    Deploys a local directory of notebooks into the workspace. When max_workers is
+    greater than 1 the directories are created a level at a time in parallel batches
+    and the notebooks are then imported using a bounded thread pool. The actions
+    are always returned in the same order as a serial deployment.
+
+    When a manifest_path is given only files whose content hash has changed since the
+    last deployment recorded in the manifest are imported, the rest are skipped. With
+    delete_removed the notebooks in the manifest that aren't part of this deployment
+    are deleted from the workspace, matched by workspace path so that deploying from
+    a different local checkout doesn't delete anything.
+    """
     # automaticall adjust for user entered paths using the wrong separators
     from_path = os.path.abspath(from_path)
 
@@ -247,7 +348,149 @@ def workspace_import_dir(from_path: str, to_path: str, sub_dirs: List[str] = Non
     if sub_dirs:
         sub_dirs = [f"{to_path}/{d}" for d in sub_dirs]
 
-    workspace_mkdirs(to_path)
+    deploy_dirs, deploy_files = _plan_import_dir(from_path, to_path, sub_dirs)
+
+    if manifest_path is None:
+        response["actions"] = _import_files(
+            to_path, deploy_dirs, deploy_files, max_workers
+        )
+        return response
+
+    manifest = _load_manifest(manifest_path, to_path)
+    hashes = {to_file: _file_hash(from_file) for from_file, to_file in deploy_files}
+    changed_files = [
+        (from_file, to_file)
+        for from_file, to_file in deploy_files
+        if manifest.get(to_file, {}).get("hash") != hashes[to_file]
+    ]
+    _logger.info(
+        f"{len(changed_files)} of {len(deploy_files)} files have changed since the last deployment"
+    )
+
+    # only the directories holding changed files need to be created
+    changed_dirs = set()
+    for _, to_file in changed_files:
+        parent = to_file.rsplit("/", 1)[0]
+        while parent.startswith(f"{to_path}/") and parent not in changed_dirs:
+            changed_dirs.add(parent)
+            parent = parent.rsplit("/", 1)[0]
+    deploy_dirs = [d for d in deploy_dirs if d in changed_dirs]
+
+    def _on_deployed(from_file: str, to_file: str):
+        manifest[to_file] = {"hash": hashes[to_file]}
+
+    try:
+        imported = _import_files(
+            to_path, deploy_dirs, changed_files, max_workers, _on_deployed
+        )
+        imported = {a["to_file_path"]: a for a in imported}
+
+        for from_file, to_file in deploy_files:
+            action = imported.get(to_file)
+            if not action:
+                action = {
+                    "action": "skip",
+                    "from_file_path": from_file,
+                    "to_file_path": to_file,
+                }
+            response["actions"].append(action)
+
+        if delete_removed:
+            # decide by workspace path so deploying from a different checkout
+            # location doesn't delete the notebooks that are still deployed
+            deployed = {to_file for _, to_file in deploy_files}
+            removed = [
+                to_file
+                for to_file in manifest
+                if to_file not in deployed and _in_sub_dirs(to_file, sub_dirs)
+            ]
+            for to_file in removed:
+                response["actions"].append(_delete_file(to_file))
+                del manifest[to_file]
+
+    finally:
+        # record whatever was deployed so a failed run doesn't redeploy it
+        _save_manifest(manifest_path, to_path, manifest)
+
+    return response
+
+
+def _import_files(
+    to_path: str,
+    deploy_dirs: List[str],
+    deploy_files: List[tuple],
+    max_workers: int = 1,
+    on_deployed=None,
+):
+    def _deploy(deploy_file: tuple):
+        action = _deploy_file(*deploy_file)
+        if on_deployed:
+            on_deployed(*deploy_file)
+        return action
+
+    if max_workers > 1:
+        _logger.info(
+            f"Deploying {len(deploy_dirs)} dirs and {len(deploy_files)} files with max_workers={max_workers}"
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for level in _dir_levels([to_path] + deploy_dirs):
+                list(executor.map(workspace_mkdirs, level))
+
+            actions = list(executor.map(_deploy, deploy_files))
+    else:
+        workspace_mkdirs(to_path)
+        for deploy_dir in deploy_dirs:
+            workspace_mkdirs(deploy_dir)
+
+        actions = [_deploy(f) for f in deploy_files]
+
+    return actions
+
+
+def _file_hash(path: str):
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(65536), b""):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+
+def _load_manifest(manifest_path: str, to_path: str):
+    """
+    Loads the deployed file hashes from the manifest. A manifest that doesn't exist
+    or was written for a different workspace path is treated as empty.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    if manifest.get("to_path") != to_path:
+        _logger.info(
+            f"Manifest {manifest_path} is for to_path={manifest.get('to_path')}, deploying all files"
+        )
+        return {}
+
+    return manifest.get("files", {})
+
+
+def _save_manifest(manifest_path: str, to_path: str, files: dict):
+    manifest = {"to_path": to_path, "files": files}
+    _logger.info(f"Writing deployment manifest {manifest_path}")
+    with open(manifest_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
+
+
+def _plan_import_dir(from_path: str, to_path: str, sub_dirs: List[str] = None):
+    """
+    Walks the local directory and returns the workspace directories to create
+    and the (from_file_path, to_file_path) files to import in deployment order.
+    """
+    deploy_dirs = []
+    deploy_files = []
+
     for root, subdirs, files in os.walk(from_path):
         dbx_root = root.replace(from_path, "")
         root_deploy_dir = to_path
@@ -258,31 +501,50 @@ def workspace_import_dir(from_path: str, to_path: str, sub_dirs: List[str] = Non
             deploy_dir = f"{root_deploy_dir}/{dir}"
             if sub_dirs:
                 if from_path == root and deploy_dir in sub_dirs:
-                    workspace_mkdirs(deploy_dir)
+                    deploy_dirs.append(deploy_dir)
                 else:
                     _logger.info(f"Skipping dir {deploy_dir}")
                 if from_path != root:
-                    workspace_mkdirs(deploy_dir)
+                    deploy_dirs.append(deploy_dir)
             else:
-                workspace_mkdirs(deploy_dir)
+                deploy_dirs.append(deploy_dir)
 
         for filename in files:
             from_file_path = os.path.join(root, filename)
             to_file_path = os.path.join(root_deploy_dir, filename)
 
-            if sub_dirs:
-                root_path = to_file_path.split("/")[:3]
-                root_path = "/".join(root_path)
-                if root_path in sub_dirs or "." in root_path:
-                    action = _deploy_file(from_file_path, to_file_path)
-                    response["actions"].append(action)
-                else:
-                    _logger.info(f"Skipping file {to_file_path}")
+            if _in_sub_dirs(to_file_path, sub_dirs):
+                deploy_files.append((from_file_path, to_file_path))
             else:
-                action = _deploy_file(from_file_path, to_file_path)
-                response["actions"].append(action)
+                _logger.info(f"Skipping file {to_file_path}")
 
-    return response
+    return deploy_dirs, deploy_files
+
+
+def _in_sub_dirs(to_file_path: str, sub_dirs: List[str] = None):
+    """
+    Returns True if the workspace file is deployed when only deploying the sub_dirs,
+    files in the root of the deployment are always deployed.
+    """
+    if not sub_dirs:
+        return True
+
+    root_path = to_file_path.split("/")[:3]
+    root_path = "/".join(root_path)
+    return root_path in sub_dirs or "." in root_path
+
+
+def _dir_levels(dirs: List[str]):
+    """
+    Groups directories by depth so that each level can be created as a
+    parallel batch once all of its parents exist.
+    """
+    levels = {}
+    for d in dict.fromkeys(dirs):
+        depth = d.rstrip("/").count("/")
+        levels.setdefault(depth, []).append(d)
+
+    return [levels[depth] for depth in sorted(levels)]
 
 
 def _deploy_file(
@@ -300,6 +562,35 @@ def _deploy_file(
     return action
 
 
+def _delete_file(to_file_path: str):
+    # notebooks are imported without their file extension
+    notebook_path, _ = os.path.splitext(to_file_path)
+    if workspace_notebook_exists(notebook_path):
+        to_file_path = notebook_path
+
+    action = {"action": "delete", "to_file_path": to_file_path}
+
+    try:
+        workspace_delete(to_file_path, recursive=False)
+    except Exception:
+        if _workspace_path_exists(to_file_path):
+            raise
+        # already gone from the workspace so there's nothing to delete
+        _logger.info(f"{to_file_path} has already been deleted from the workspace")
+        action["action"] = "already_deleted"
+
+    return action
+
+
+def _workspace_path_exists(path: str):
+    try:
+        workspace_get_status(path)
+    except Exception:
+        return False
+
+    return True
+
+
 def _deploy_dir(deploy_dir: str):
     # make the directory it's not the root
     action = None
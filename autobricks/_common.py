@@ -1,7 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from io import TextIOWrapper
 import os
-from typing import Union, List
+from typing import Iterable, Union, List
 import yaml
 import json
 
@@ -54,3 +55,45 @@ def tags_exist_in(tags: Union[str, List[str], None], in_tags: List[str]):
         return set(tags).issubset(set(in_tags))
     else:
         return True
+
+
+def run_all(fn, items: Iterable, max_workers: int = 1):
+    """
+    fn:callable         called with each item
+    items:Iterable      the items to call fn with
+    max_workers:int=1   number of items run concurrently, 1 runs them serially
+
+    Runs fn on every item using a bounded thread pool and returns the results in the
+    same order as the items whether they were run serially or concurrently.
+    """
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(fn, items))
+
+    return [fn(item) for item in items]
+
+
+def status_report(results: List[dict], statuses: List[str], key: str = None):
+    """
+    results:List[dict]  results of a bulk operation each with a status
+    statuses:List[str]  the statuses to count
+    key:str=None        key to hold the results in the report, None leaves them out
+
+    Returns a report of a bulk operation with the number of results in each status.
+    """
+    report = {key: results} if key else {}
+    for status in statuses:
+        report[status] = len([r for r in results if r["status"] == status])
+
+    return report
+
+
+def raise_failed(results: List[dict]):
+    """
+    results:List[dict]  results of a bulk operation each with a status
+
+    Raises an exception with the errors of all the failed results if there are any.
+    """
+    errors = [r["error"] for r in results if r["status"] == "failed"]
+    if errors:
+        raise Exception("\n".join(errors))
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from typing import Iterable
+from .api_service import autobricks_logging
+
+_logger = autobricks_logging.get_logger(__name__)
+
+DEFAULT_MIN_POLL_SECONDS = 5
+DEFAULT_MAX_POLL_SECONDS = 60
+DEFAULT_BACKOFF = 1.5
+
+FINAL_LIFE_CYCLE_STATES = ("TERMINATED", "SKIPPED", "INTERNAL_ERROR")
+
+
+def _life_cycle_state(run: dict):
+    return run.get("state", {}).get("life_cycle_state")
+
+
+class JobRunMonitor:
+    """
+    list_active_runs:callable       returns all the active runs i.e. runs/list with active_only
+    get_run:callable                returns a single run by run_id i.e. Job.job_run_get
+    run_ids:Iterable[int]           the runs to monitor
+    on_transition:callable=None     called with each transition as the runs change state
+    min_poll_seconds:float=5        seconds between polls after a run changes state
+    max_poll_seconds:float=60       longest seconds between polls while nothing changes
+    backoff:float=1.5               the poll interval grows by this factor while nothing changes
+
+    Monitors many job runs together. While more than one run is being monitored each
+    poll lists the active runs in one batch instead of getting every run, and only runs
+    that have left the active list are got individually for their final state. The poll
+    interval backs off while nothing changes and resets when a run changes state.
+
+    A transition is a dictionary of the run_id, previous_state, state and run where the
+    states are life cycle states and previous_state is None for the first state seen.
+    Transitions are delivered to on_transition and by iterating over the monitor, either
+    with a for loop or an async for loop.
+    """
+
+    def __init__(
+        self,
+        list_active_runs,
+        get_run,
+        run_ids: Iterable[int],
+        on_transition=None,
+        min_poll_seconds: float = DEFAULT_MIN_POLL_SECONDS,
+        max_poll_seconds: float = DEFAULT_MAX_POLL_SECONDS,
+        backoff: float = DEFAULT_BACKOFF,
+    ):
+        self._list_active_runs = list_active_runs
+        self._get_run = get_run
+        self.on_transition = on_transition
+        self.min_poll_seconds = min_poll_seconds
+        self.max_poll_seconds = max_poll_seconds
+        self.backoff = backoff
+        self.poll_seconds = min_poll_seconds
+        self.states = {run_id: None for run_id in run_ids}
+        self.runs = {}
+
+    @property
+    def pending(self):
+        return [
+            run_id
+            for run_id, state in self.states.items()
+            if state not in FINAL_LIFE_CYCLE_STATES
+        ]
+
+    def done(self):
+        return not self.pending
+
+    def poll(self):
+        """
+        Polls the pending runs once and returns the transitions since the last poll.
+        """
+        pending = self.pending
+        if len(pending) > 1:
+            active = {run["run_id"]: run for run in self._list_active_runs()}
+            runs = [active[r] if r in active else self._get_run(r) for r in pending]
+        else:
+            runs = [self._get_run(r) for r in pending]
+
+        transitions = []
+        for run_id, run in zip(pending, runs):
+            state = _life_cycle_state(run)
+            previous_state = self.states[run_id]
+            self.runs[run_id] = run
+            if state != previous_state:
+                self.states[run_id] = state
+                transitions.append(
+                    {
+                        "run_id": run_id,
+                        "previous_state": previous_state,
+                        "state": state,
+                        "run": run,
+                    }
+                )
+
+        for transition in transitions:
+            _logger.info(
+                f"run_id={transition['run_id']} {transition['previous_state']} => {transition['state']}"
+            )
+            if self.on_transition:
+                self.on_transition(transition)
+
+        if transitions:
+            self.poll_seconds = self.min_poll_seconds
+        else:
+            self.poll_seconds = min(
+                self.poll_seconds * self.backoff, self.max_poll_seconds
+            )
+
+        return transitions
+
+    def wait(self, timeout: float = None):
+        """
+        timeout:float=None  seconds to wait before raising a TimeoutError
+
+        Polls until every run has finished and returns the final runs by run_id.
+        """
+        for _ in self._iter(timeout):
+            pass
+
+        return self.runs
+
+    def _iter(self, timeout: float = None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            yield from self.poll()
+            if self.done():
+                return
+
+            wait = self.poll_seconds
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Timed out waiting for runs {self.pending}")
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def __iter__(self):
+        return self._iter()
+
+    async def __aiter__(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            for transition in await loop.run_in_executor(None, self.poll):
+                yield transition
+            if self.done():
+                return
+
+            await asyncio.sleep(self.poll_seconds)
@@ -0,0 +1,74 @@
+import threading
+from .api_service import autobricks_logging
+
+_logger = autobricks_logging.get_logger(__name__)
+
+
+class QueryCatalogue:
+    """
+    list_queries:callable       returns every query i.e. Sql.queries with pages fetched in parallel
+
+    In memory catalogue of the SQL queries in a workspace indexed by lower case name.
+    The queries are listed once and then kept up to date in place as queries are
+    created, updated and deleted so that an import doesn't search for every query.
+    """
+
+    def __init__(self, list_queries):
+        self._list_queries = list_queries
+        self._by_name = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self):
+        """
+        Lists all the queries and replaces the catalogue with them.
+        """
+        queries = self._list_queries()
+        by_name = {}
+        for query in queries:
+            by_name[query["name"].lower()] = self._entry(query)
+
+        with self._lock:
+            self._by_name = by_name
+            self.loaded = True
+
+        _logger.info(f"Catalogued {len(by_name)} queries")
+        return self
+
+    @staticmethod
+    def _entry(query: dict):
+        return {
+            "id": query["id"],
+            "name": query["name"],
+            "data_source_id": query.get("data_source_id"),
+            "parent": query.get("options", {}).get("parent", query.get("parent")),
+        }
+
+    def get(self, name: str):
+        with self._lock:
+            return self._by_name.get(name.lower())
+
+    def put(self, query: dict):
+        """
+        query:dict  query details as returned by the queries api
+
+        Adds or replaces a query after it's created or updated.
+        """
+        entry = self._entry(query)
+        with self._lock:
+            self._by_name[entry["name"].lower()] = entry
+
+    def remove(self, query_id: str):
+        """
+        query_id:str    id of a deleted query
+        """
+        with self._lock:
+            names = [n for n, q in self._by_name.items() if q["id"] == query_id]
+            for name in names:
+                del self._by_name[name]
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def __contains__(self, name: str):
+        return self.get(name) is not None
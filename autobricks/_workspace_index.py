@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .api_service import autobricks_logging
+
+_logger = autobricks_logging.get_logger(__name__)
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_WORKERS = 8
+
+_DIRECTORY = "DIRECTORY"
+
+
+class WorkspaceIndex:
+    """
+    list_path:callable          lists a workspace directory i.e. Workspace.workspace_list
+    root:str="/"                workspace directory to index
+    ttl:float=300               seconds before the index is stale and is crawled again
+    max_workers:int=8           number of directories listed concurrently
+    persist_path:str=None       optional local file to save and load the index
+
+    Index of the workspace objects under a root directory by object id and by path.
+    The workspace is crawled breadth first with a pool of workers listing directories
+    concurrently, after which lookups are dictionary lookups until the ttl expires.
+    """
+
+    def __init__(
+        self,
+        list_path,
+        root: str = "/",
+        ttl: float = DEFAULT_TTL,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        persist_path: str = None,
+    ):
+        self._list_path = list_path
+        self.root = root
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.persist_path = persist_path
+        self.crawled_at = 0
+        self._by_id = {}
+        self._by_path = {}
+        self._lock = threading.Lock()
+
+        if persist_path:
+            self.load()
+
+    def is_stale(self, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() - self.crawled_at > ttl
+
+    def refresh(self, force: bool = False, ttl: float = None, max_workers: int = None):
+        """
+        force:bool=False        crawl the workspace even if the index isn't stale
+        ttl:float=None          the ttl for this call, defaults to the index's ttl
+        max_workers:int=None    the max_workers for this call, defaults to the index's max_workers
+
+        Crawls the workspace again if the index is stale or force is set. The ttl and
+        max_workers only apply to this call so that callers sharing an index don't
+        change each other's settings.
+        """
+        with self._lock:
+            if force or self.is_stale(ttl):
+                self._crawl(max_workers or self.max_workers)
+
+        return self
+
+    def get_path(self, object_id: str):
+        return self._by_id.get(str(object_id))
+
+    def get(self, path: str):
+        return self._by_path.get(path)
+
+    def paths(self):
+        return self._by_path.keys()
+
+    def _crawl(self, max_workers: int):
+        _logger.info(f"Indexing workspace {self.root} with max_workers={max_workers}")
+        started = time.time()
+        by_id = {}
+        by_path = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(self._list_path, self.root)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    response = future.result() or {}
+                    for obj in response.get("objects", []):
+                        by_id[str(obj["object_id"])] = obj["path"]
+                        by_path[obj["path"]] = obj
+                        if obj["object_type"] == _DIRECTORY:
+                            pending.add(executor.submit(self._list_path, obj["path"]))
+
+        self._by_id = by_id
+        self._by_path = by_path
+        self.crawled_at = started
+        _logger.info(
+            f"Indexed {len(by_path)} workspace objects in {time.time() - started:.2f}s"
+        )
+
+        if self.persist_path:
+            self.save()
+
+    def save(self):
+        index = {
+            "root": self.root,
+            "crawled_at": self.crawled_at,
+            "objects": list(self._by_path.values()),
+        }
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.persist_path)
+
+    def load(self):
+        if not os.path.exists(self.persist_path):
+            return
+
+        with open(self.persist_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+        if index.get("root") != self.root:
+            return
+
+        self._by_path = {obj["path"]: obj for obj in index["objects"]}
+        self._by_id = {str(obj["object_id"]): obj["path"] for obj in index["objects"]}
+        self.crawled_at = index["crawled_at"]
@@ -1,5 +1,10 @@
-from .api_service import ApiService
+from .api_service import ApiService, LazyApiService
+from .async_api_service import AsyncApiService
+from ._shared import shared_api_service, shared_async_api_service, get_api_service
 from ._configuration import configuration
+from ._metrics import metrics
+from ._retry import RetryPolicy
+from ._rate_limiter import rate_limiter, RateLimiter
 from . import autobricks_logging
 from ._exceptions import (
     AutobricksAuthTypeNotRegistered,
@@ -10,8 +15,17 @@ from ._exceptions import (
 
 __all__ = [
     "ApiService",
+    "AsyncApiService",
+    "LazyApiService",
+    "shared_api_service",
+    "shared_async_api_service",
+    "get_api_service",
     "autobricks_logging",
     "configuration",
+    "metrics",
+    "RetryPolicy",
+    "rate_limiter",
+    "RateLimiter",
     "AutobricksAuthTypeNotRegistered",
     "AutobricksConfigurationInvalid",
     "AutobricksResponseJsonError",
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 
 import adal
 from ._base_api import base_api_get as _api_get
+from ._token_cache import TokenProvider, expires_on, get_token_file_cache
 from . import autobricks_logging
 
 _logger = autobricks_logging.get_logger(__name__)
@@ -45,15 +46,29 @@ class SPAuth(Auth):
             "client_id": self.sp_client_id,
             "client_secret": self.sp_client_secret,
         }
+        self._token_cache = get_token_file_cache(parameters, self.sp_client_secret)
 
         # get AD token
-        self._authority_data["resource"] = self.ad_resource
-        response = _api_get(
-            url=self._authority_url,
-            headers=self._authority_headers,
-            data=self._authority_data,
-        )
-        self.bearer_token = response.json()["access_token"]
+        self._ad_token = self._get_token_provider(self.ad_resource)
+        self._ad_token.get_token()
+
+    def _get_token_provider(self, resource: str):
+        def _fetch():
+            data = {**self._authority_data, "resource": resource}
+            response = _api_get(
+                url=self._authority_url,
+                headers=self._authority_headers,
+                data=data,
+            )
+            token = response.json()
+            return token["access_token"], expires_on(token)
+
+        cache_key = f"{self.tenant_id}/{self.sp_client_id}/{resource}"
+        return TokenProvider(_fetch, self._token_cache, cache_key)
+
+    @property
+    def bearer_token(self):
+        return self._ad_token.get_token()
 
     def get_headers(self):
         headers = {"Authorization": f"Bearer {self.bearer_token}"}
@@ -71,13 +86,12 @@ class SPMgmtEndpointAuth(SPAuth):
         self.resource_group = parameters["resource_group"]
         self.subscription_id = parameters["subscription_id"]
 
-        self._authority_data["resource"] = self.mgmt_resource_endpoint
-        response = _api_get(
-            url=self._authority_url,
-            headers=self._authority_headers,
-            data=self._authority_data,
-        )
-        self.mgmt_access_token = response.json()["access_token"]
+        self._mgmt_token = self._get_token_provider(self.mgmt_resource_endpoint)
+        self._mgmt_token.get_token()
+
+    @property
+    def mgmt_access_token(self):
+        return self._mgmt_token.get_token()
 
     def get_headers(self):
         url = f"/subscriptions/{self.subscription_id}/resourceGroups/{self.resource_group}/providers/Microsoft.Databricks/workspaces/{self.workspace_name}"
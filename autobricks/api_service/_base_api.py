@@ -1,7 +1,12 @@
 import requests
-from requests.exceptions import HTTPError
+from requests.adapters import HTTPAdapter
+from requests.exceptions import HTTPError, RequestException
 from . import autobricks_logging
+from ._metrics import metrics
+from ._retry import RetryPolicy
 import os
+import threading
+import time
 
 _logger = autobricks_logging.get_logger(__name__)
 
@@ -9,87 +14,186 @@ _ssl_verify = False if os.getenv("SSL_VERIFY", "true").lower() == "false" else T
 if not _ssl_verify:
     _logger.info("WARNING SSL Verification is off!")
 
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 32
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    keep_alive: bool = True,
+):
+    """
+    pool_connections:int    Number of per host connection pools to cache
+    pool_maxsize:int        Maximum number of connections kept open in each host pool
+    keep_alive:bool         Keep connections open between requests so they can be reused
+
+    Returns the process wide requests.Session for the given pool settings, creating it
+    on first use. Sharing the session means every ApiService reuses the same TCP+TLS
+    connections to the workspace host instead of opening a new one per request.
+    """
+    key = (pool_connections, pool_maxsize, keep_alive)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if not session:
+            _logger.debug(
+                f"Creating http session pool_connections={pool_connections} pool_maxsize={pool_maxsize} keep_alive={keep_alive}"
+            )
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_connections, pool_maxsize=pool_maxsize
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if not keep_alive:
+                session.headers["Connection"] = "close"
+            _sessions[key] = session
+
+    return session
+
+
+def _request(
+    method: str,
+    url: str,
+    session: requests.Session = None,
+    retry_policy: RetryPolicy = None,
+    rate_limit=None,
+    **kwargs,
+):
+    """
+    Sends the request using the session, retrying it while the retry policy
+    allows, and raises an HTTPError for any unsuccessful response. The rate_limit
+    callable is called before every attempt so that retries are rate limited too.
+    """
+    session = session or get_session()
+    attempt = 0
+
+    while True:
+        if rate_limit:
+            rate_limit()
+        metrics.increment("requests")
+        response = None
+        try:
+            response = session.request(method, url=url, verify=_ssl_verify, **kwargs)
+            response.raise_for_status()
+            return response
+
+        except HTTPError as e:
+            status_code = e.response.status_code
+            if not _can_retry(retry_policy, attempt, method, status_code=status_code):
+                msg = f"{status_code} error at {url} {e.response.text}"
+                _logger.error(msg)
+                raise e
+            reason = f"{status_code} error"
+
+        except RequestException as e:
+            if not _can_retry(retry_policy, attempt, method, exception=e):
+                raise e
+            reason = type(e).__name__
+
+        wait = retry_policy.backoff(attempt, response)
+        attempt += 1
+        metrics.increment("retries")
+        _logger.info(
+            f"Retrying {method} {url} after {reason} in {wait:.2f}s (retry {attempt} of {retry_policy.max_retries})"
+        )
+        time.sleep(wait)
+
+
+def _can_retry(retry_policy: RetryPolicy, attempt: int, method: str, **kwargs):
+    if not retry_policy or attempt >= retry_policy.max_retries:
+        return False
+    return retry_policy.is_retryable(method, **kwargs)
+
 
 def base_api_get(
-    url: str, headers: dict, json: dict = None, data: dict = None, params=None
+    url: str,
+    headers: dict,
+    json: dict = None,
+    data: dict = None,
+    params=None,
+    session: requests.Session = None,
+    retry_policy: RetryPolicy = None,
+    rate_limit=None,
 ):
-    response = requests.get(
-        url=url,
+    return _request(
+        "GET",
+        url,
+        session,
+        retry_policy,
+        rate_limit,
         headers=headers,
         json=json,
         data=data,
-        verify=_ssl_verify,
         params=params,
     )
 
-    try:
-        response.raise_for_status()
-
-    except HTTPError as e:
-        msg = f"{e.response.status_code} error at {url} {e.response.text}"
-        _logger.error(msg)
-        raise e
-
-    return response
-
 
 def base_api_put(
-    url: str, headers: dict, json: dict = None, data: dict = None, params=None
+    url: str,
+    headers: dict,
+    json: dict = None,
+    data: dict = None,
+    params=None,
+    session: requests.Session = None,
+    retry_policy: RetryPolicy = None,
+    rate_limit=None,
 ):
-    response = requests.put(
-        url=url,
+    return _request(
+        "PUT",
+        url,
+        session,
+        retry_policy,
+        rate_limit,
         headers=headers,
         json=json,
         data=data,
-        verify=_ssl_verify,
         params=params,
     )
 
-    try:
-        response.raise_for_status()
-
-    except HTTPError as e:
-        msg = f"{e.response.status_code} error at {url} {e.response.text}"
-        _logger.error(msg)
-        raise e
-
-    return response
-
 
 def base_api_delete(
-    url: str, headers: dict, json: dict = None, data: dict = None, params=None
+    url: str,
+    headers: dict,
+    json: dict = None,
+    data: dict = None,
+    params=None,
+    session: requests.Session = None,
+    retry_policy: RetryPolicy = None,
+    rate_limit=None,
 ):
-    response = requests.delete(
-        url=url,
+    return _request(
+        "DELETE",
+        url,
+        session,
+        retry_policy,
+        rate_limit,
         headers=headers,
         json=json,
         data=data,
-        verify=_ssl_verify,
         params=params,
     )
 
-    try:
-        response.raise_for_status()
-
-    except HTTPError as e:
-        msg = f"{e.response.status_code} error at {url} {e.response.text}"
-        _logger.error(msg)
-        raise e
-
-    return response
 
-
-def base_api_post(url: str, headers: dict, json: dict = None, data: dict = None):
-    response = requests.post(
-        url=url, headers=headers, json=json, data=data, verify=_ssl_verify
+def base_api_post(
+    url: str,
+    headers: dict,
+    json: dict = None,
+    data: dict = None,
+    session: requests.Session = None,
+    retry_policy: RetryPolicy = None,
+    rate_limit=None,
+):
+    return _request(
+        "POST",
+        url,
+        session,
+        retry_policy,
+        rate_limit,
+        headers=headers,
+        json=json,
+        data=data,
     )
-
-    try:
-        response.raise_for_status()
-
-    except HTTPError as e:
-        msg = f"{e.response.status_code} error at {url} {e.response.text}"
-        _logger.error(msg)
-        raise e
-
-    return response
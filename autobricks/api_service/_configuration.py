@@ -96,4 +96,13 @@ configuration = {
     "subscription_id": os.getenv("SUBSCRIPTION_ID"),
     "auth_type": os.getenv("AUTH_TYPE", "SERVICE_PRINCIPAL"),
     "databricks_api_host": os.getenv("DATABRICKS_API_HOST"),
+    "pool_connections": os.getenv("AUTOBRICKS_POOL_CONNECTIONS", "10"),
+    "pool_maxsize": os.getenv("AUTOBRICKS_POOL_MAXSIZE", "32"),
+    "keep_alive": os.getenv("AUTOBRICKS_KEEP_ALIVE", "true"),
+    "max_retries": os.getenv("AUTOBRICKS_MAX_RETRIES", "3"),
+    "retry_backoff_factor": os.getenv("AUTOBRICKS_RETRY_BACKOFF_FACTOR", "0.5"),
+    "retry_max_backoff": os.getenv("AUTOBRICKS_RETRY_MAX_BACKOFF", "60"),
+    "rate_limit": os.getenv("AUTOBRICKS_RATE_LIMIT"),
+    "rate_limits": os.getenv("AUTOBRICKS_RATE_LIMITS"),
+    "token_cache": os.getenv("AUTOBRICKS_TOKEN_CACHE"),
 }
@@ -0,0 +1,50 @@
+import threading
+from . import autobricks_logging
+
+_logger = autobricks_logging.get_logger(__name__)
+
+
+class ApiMetrics:
+    """
+    Thread safe counters of the api calls made by the process, e.g. the number of
+    requests and retries. Used to tune the concurrency of bulk operations.
+    The counters are also kept per thread so that a worker can attribute the
+    requests and retries to the item it's working on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._local = threading.local()
+
+    def _thread_counters(self):
+        if not hasattr(self._local, "counters"):
+            self._local.counters = {}
+        return self._local.counters
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        counters = self._thread_counters()
+        counters[name] = counters.get(name, 0) + value
+
+    def get(self, name: str):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def get_thread(self, name: str):
+        """
+        Returns the counter for the calls made by the current thread only.
+        """
+        return self._thread_counters().get(name, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+
+
+metrics = ApiMetrics()
@@ -0,0 +1,154 @@
+import threading
+import time
+from ._configuration import configuration
+from ._exceptions import AutobricksConfigurationInvalid
+from ._metrics import metrics
+from . import autobricks_logging
+
+_logger = autobricks_logging.get_logger(__name__)
+
+
+class TokenBucket:
+    """
+    rate:float          tokens added to the bucket per second
+    capacity:float=None maximum tokens the bucket holds i.e. the burst size, defaults to the rate
+
+    Classic token bucket. Each request takes a token, when the bucket is empty
+    callers wait until their token has been added.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive, rate={rate}")
+
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token from the bucket, borrowing against future tokens if it's empty.
+        Returns the number of seconds the caller must wait before using the token.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        """
+        Takes a token from the bucket waiting until one is available.
+        Returns the number of seconds waited.
+        """
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+        return wait
+
+
+class RateLimiter:
+    """
+    default_rate:float=None     requests per second for endpoint families without their own rate, None is unlimited
+    rates:dict=None             requests per second by endpoint family e.g. {"workspace": 20, "jobs": 10}
+
+    Process wide client side rate limiter with a token bucket per endpoint family,
+    the family being the api e.g. workspace, dbfs, jobs, sql, clusters. The seconds
+    callers spend waiting are recorded in the api metrics.
+    """
+
+    def __init__(self, default_rate: float = None, rates: dict = None):
+        self._lock = threading.Lock()
+        self._default_rate = default_rate
+        self._rates = dict(rates or {})
+        self._buckets = {}
+
+    def configure(self, family: str = None, rate: float = None):
+        """
+        Sets the rate of an endpoint family, or the default rate if no family is given.
+        A rate of None removes the limit.
+        """
+        with self._lock:
+            if family:
+                self._rates[family] = rate
+            else:
+                self._default_rate = rate
+            self._buckets = {}
+
+    def reserve(self, family: str):
+        """
+        Takes a token for the endpoint family without waiting. Returns the seconds
+        the caller must wait before making the request, used by async callers.
+        """
+        bucket = self._get_bucket(family)
+        if not bucket:
+            return 0.0
+
+        wait = bucket.reserve()
+        if wait:
+            metrics.increment("rate_limiter_wait_seconds", wait)
+            metrics.increment(f"rate_limiter_wait_seconds.{family}", wait)
+            _logger.debug(f"Waiting {wait:.3f}s in the {family} rate limiter")
+
+        return wait
+
+    def acquire(self, family: str):
+        """
+        Takes a token for the endpoint family waiting until it's available.
+        Returns the seconds waited.
+        """
+        wait = self.reserve(family)
+        if wait:
+            time.sleep(wait)
+
+        return wait
+
+    def _get_bucket(self, family: str):
+        with self._lock:
+            if family not in self._buckets:
+                rate = self._rates.get(family, self._default_rate)
+                self._buckets[family] = TokenBucket(rate) if rate else None
+
+            return self._buckets[family]
+
+
+def _parse_rate(name: str, value: str):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        e = AutobricksConfigurationInvalid(name, value=value)
+        _logger.error(e.message)
+        raise e
+
+
+def _parse_rates(name: str, value: str):
+    """
+    Parses endpoint family rates in the format workspace=20,jobs=10
+    """
+    rates = {}
+    if not value:
+        return rates
+
+    for family_rate in value.split(","):
+        try:
+            family, rate = family_rate.split("=")
+        except ValueError:
+            e = AutobricksConfigurationInvalid(name, value=value)
+            _logger.error(e.message)
+            raise e
+        rates[family.strip()] = _parse_rate(name, rate.strip())
+
+    return rates
+
+
+rate_limiter = RateLimiter(
+    default_rate=_parse_rate("rate_limit", configuration.get("rate_limit")),
+    rates=_parse_rates("rate_limits", configuration.get("rate_limits")),
+)
@@ -0,0 +1,99 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+from . import autobricks_logging
+
+_logger = autobricks_logging.get_logger(__name__)
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_MAX_BACKOFF = 60
+
+# a throttled request was rejected before it was processed so can always be retried
+_RATE_LIMITED = 429
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+_IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE")
+
+
+class RetryPolicy:
+    """
+    max_retries:int         maximum number of retries of a request, 0 disables retries
+    backoff_factor:float    seconds the exponential backoff is based on
+    max_backoff:float       maximum number of seconds to wait between retries
+
+    Decides if a failed request can be retried and how long to wait before
+    retrying it. Idempotent verbs are retried on throttling, server errors and
+    connection errors. POST isn't idempotent so it's only retried when the
+    request can't have been processed, i.e. it was throttled or the connection
+    couldn't be made.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+    ):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+    def is_retryable(
+        self, method: str, status_code: int = None, exception: Exception = None
+    ):
+        if exception is not None:
+            if not isinstance(exception, (ConnectionError, Timeout)):
+                return False
+            connected = not isinstance(exception, ConnectTimeout)
+            return self.is_retryable_connection_error(method, connected)
+
+        if status_code == _RATE_LIMITED:
+            return True
+
+        return _is_idempotent(method) and status_code in _RETRY_STATUSES
+
+    def is_retryable_connection_error(self, method: str, connected: bool = True):
+        """
+        A request that failed before the connection was made can always be retried,
+        once connected it may have been processed so only idempotent verbs are retried.
+        """
+        return not connected or _is_idempotent(method)
+
+    def backoff(self, attempt: int, response=None):
+        """
+        Returns the seconds to wait before the retry attempt. A Retry-After header
+        on the response is honoured otherwise it's an exponential backoff with
+        full jitter so that concurrent callers don't retry in lock step.
+        """
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+
+        backoff = min(self.max_backoff, self.backoff_factor * (2**attempt))
+        return random.uniform(0, backoff)
+
+
+def _is_idempotent(method: str):
+    return method.upper() in _IDEMPOTENT_METHODS
+
+
+def _retry_after(response):
+    if response is None:
+        return None
+
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        _logger.debug(f"Ignoring invalid Retry-After header {retry_after}")
+        return None
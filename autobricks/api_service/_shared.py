@@ -0,0 +1,11 @@
+from .api_service import ApiService, LazyApiService
+from .async_api_service import AsyncApiService
+
+# process wide services shared by every autobricks module, the ApiService is
+# created and authenticated on first use
+shared_api_service = LazyApiService()
+shared_async_api_service = AsyncApiService(shared_api_service)
+
+
+def get_api_service() -> ApiService:
+    return shared_api_service.get()
@@ -0,0 +1,192 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from . import autobricks_logging
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+_logger = autobricks_logging.get_logger(__name__)
+
+# refresh tokens in the background when they have less than this left
+DEFAULT_REFRESH_MARGIN = 300
+# tokens with less than this left are refreshed before they're used
+_MIN_VALIDITY = 60
+# used when the token response doesn't say when it expires
+_DEFAULT_EXPIRES_IN = 3600
+
+
+def expires_on(token_response: dict):
+    """
+    Returns the epoch time a token from an AAD token response expires.
+    """
+    if token_response.get("expires_on"):
+        return float(token_response["expires_on"])
+
+    expires_in = float(token_response.get("expires_in", _DEFAULT_EXPIRES_IN))
+    return time.time() + expires_in
+
+
+class TokenFileCache:
+    """
+    path:str        file to cache the tokens in
+    secret:str      secret the encryption key is derived from e.g. the client secret
+
+    Encrypted on disk cache of tokens so that short lived processes can reuse a
+    token that is still valid. Requires the cryptography package.
+    """
+
+    def __init__(self, path: str, secret: str):
+        self.path = path
+        key = hashlib.sha256(secret.encode("utf-8")).digest()
+        self._fernet = Fernet(base64.urlsafe_b64encode(key))
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            token = self._read().get(key)
+
+        if token:
+            return token["access_token"], token["expires_on"]
+
+        return None, 0
+
+    def set(self, key: str, access_token: str, expires_on: float):
+        with self._lock:
+            tokens = self._read()
+            now = time.time()
+            tokens = {k: t for k, t in tokens.items() if t["expires_on"] > now}
+            tokens[key] = {"access_token": access_token, "expires_on": expires_on}
+            self._write(tokens)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path, "rb") as f:
+                return json.loads(self._fernet.decrypt(f.read()))
+        except (InvalidToken, ValueError, OSError) as e:
+            _logger.info(f"Ignoring unreadable token cache {self.path}: {e}")
+            return {}
+
+    def _write(self, tokens: dict):
+        content = self._fernet.encrypt(json.dumps(tokens).encode("utf-8"))
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
+
+
+def get_token_file_cache(parameters: dict, secret: str):
+    """
+    Returns the token file cache if one is configured, otherwise None.
+    """
+    path = parameters.get("token_cache")
+    if not path:
+        return None
+
+    if Fernet is None:
+        _logger.info(
+            "WARNING token cache is disabled, it requires the cryptography package"
+        )
+        return None
+
+    return TokenFileCache(os.path.expanduser(path), secret)
+
+
+class TokenProvider:
+    """
+    fetch:callable              returns a new (access_token, expires_on) tuple
+    cache:TokenFileCache=None   optional on disk cache shared between processes
+    cache_key:str=None          key of the token in the cache
+    refresh_margin:float=300    seconds before expiry that the token is refreshed in the background
+
+    Holds a token and refreshes it before it expires. Threads share the token and
+    only one of them fetches a new token when it's needed. Within the refresh margin
+    the token is refreshed in the background and callers keep getting the current
+    token without waiting for it.
+    """
+
+    def __init__(
+        self,
+        fetch,
+        cache: TokenFileCache = None,
+        cache_key: str = None,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+    ):
+        self._fetch = fetch
+        self._cache = cache
+        self._cache_key = cache_key
+        self.refresh_margin = refresh_margin
+        self._access_token = None
+        self._expires_on = 0
+        self._lock = threading.Lock()
+        self._refresh_thread_lock = threading.Lock()
+        self._refresh_thread: threading.Thread = None
+
+        if cache:
+            self._access_token, self._expires_on = cache.get(cache_key)
+
+    @property
+    def expires_on(self):
+        return self._expires_on
+
+    def get_token(self):
+        remaining = self._expires_on - time.time()
+
+        if remaining < _MIN_VALIDITY:
+            with self._lock:
+                # another thread may have refreshed it while we waited
+                if self._expires_on - time.time() < _MIN_VALIDITY:
+                    self._refresh()
+
+        elif remaining < self.refresh_margin:
+            # the current token is still valid, return it rather than racing
+            # the background refresh
+            access_token = self._access_token
+            self._refresh_in_background()
+            return access_token
+
+        return self._access_token
+
+    def _refresh(self):
+        _logger.debug("Acquiring a new access token")
+        access_token, expires_on = self._fetch()
+        self._set_token(access_token, expires_on)
+
+    def _set_token(self, access_token: str, expires_on: float):
+        # a slower refresh mustn't replace a newer token
+        if expires_on <= self._expires_on:
+            return
+
+        self._access_token, self._expires_on = access_token, expires_on
+
+        if self._cache:
+            self._cache.set(self._cache_key, access_token, expires_on)
+
+    def _refresh_in_background(self):
+        def _refresh():
+            try:
+                if self._expires_on - time.time() < self.refresh_margin:
+                    _logger.debug("Acquiring a new access token in the background")
+                    # fetch without the lock so callers keep using the current
+                    # token, the lock is only held to swap the new one in
+                    access_token, expires_on = self._fetch()
+                    with self._lock:
+                        self._set_token(access_token, expires_on)
+            except Exception as e:
+                # the token is still valid so the next call will try again
+                _logger.info(f"Background token refresh failed: {e}")
+
+        with self._refresh_thread_lock:
+            if self._refresh_thread and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=_refresh, daemon=True)
+            self._refresh_thread.start()
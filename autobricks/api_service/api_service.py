@@ -5,11 +5,23 @@ from ._base_api import (
     base_api_post as _base_api_post,
     base_api_delete as _base_api_delete,
     base_api_put as _base_api_put,
+    get_session as _get_session,
+    DEFAULT_POOL_CONNECTIONS,
+    DEFAULT_POOL_MAXSIZE,
 )
+from ._retry import (
+    RetryPolicy,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_MAX_BACKOFF,
+)
+from ._rate_limiter import rate_limiter
 from . import autobricks_logging
 from ._exceptions import AutobricksConfigurationInvalid, AutobricksResponseJsonError
 from ._configuration import configuration
+import functools
 import json
+import threading
 
 _logger = autobricks_logging.get_logger(__name__)
 
@@ -18,7 +30,43 @@ _API_VERSION = "2.0"
 _PREVIEW = "preview"
 
 
+def _get_int_config(config: dict, name: str, default: int):
+    return _get_number_config(config, name, default, int)
+
+
+def _get_float_config(config: dict, name: str, default: float):
+    return _get_number_config(config, name, default, float)
+
+
+def _get_number_config(config: dict, name: str, default, number_type: type):
+    value = config.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return number_type(value)
+    except (TypeError, ValueError):
+        e = AutobricksConfigurationInvalid(name, value=value)
+        _logger.error(e.message)
+        raise e
+
+
+def _get_bool_config(config: dict, name: str, default: bool):
+    value = config.get(name)
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() != "false"
+
+
 class ApiService:
+    """
+    config:dict=None    configuration, defaults to the configuration taken from the environment
+
+    Wraps the databricks REST api with authentication, a pooled http session,
+    retries and rate limiting.
+    """
+
     def __init__(self, config: dict = None):
         _logger.info("Initialising ApiService")
 
@@ -62,12 +110,61 @@ class ApiService:
             _logger.error(e.message)
             raise e
 
-        auth: Auth = auth_factory.get_auth(self.auth_type, _config)
+        # all services with the same pool settings share one pooled keep-alive session
+        self._session = _get_session(
+            pool_connections=_get_int_config(
+                _config, "pool_connections", DEFAULT_POOL_CONNECTIONS
+            ),
+            pool_maxsize=_get_int_config(_config, "pool_maxsize", DEFAULT_POOL_MAXSIZE),
+            keep_alive=_get_bool_config(_config, "keep_alive", True),
+        )
+
+        self.retry_policy = RetryPolicy(
+            max_retries=_get_int_config(_config, "max_retries", DEFAULT_MAX_RETRIES),
+            backoff_factor=_get_float_config(
+                _config, "retry_backoff_factor", DEFAULT_BACKOFF_FACTOR
+            ),
+            max_backoff=_get_float_config(
+                _config, "retry_max_backoff", DEFAULT_MAX_BACKOFF
+            ),
+        )
+
+        # authentication is deferred until the first request so that constructing
+        # the service doesn't make any network calls
+        self._config = _config
+        self._auth: Auth = None
+        self._auth_lock = threading.Lock()
+
+    @property
+    def auth(self) -> Auth:
+        if self._auth is None:
+            with self._auth_lock:
+                if self._auth is None:
+                    _logger.debug("Setting Authorisation Headers")
+                    self._auth = auth_factory.get_auth(self.auth_type, self._config)
+
+        return self._auth
+
+    @property
+    def headers(self) -> dict:
+        return self.auth.get_headers()
+
+    def get_url(
+        self,
+        api: str,
+        function: str = None,
+        preview: bool = False,
+        api_version=_API_VERSION,
+    ):
+        if preview:
+            url = f"{self.host}/api/{api_version}/{_PREVIEW}/{api}"
+        else:
+            url = f"{self.host}/api/{api_version}/{api}"
+
+        if function:
+            url = f"{url}/{function}"
 
-        _logger.debug("Setting Authorisation Headers")
-        self._headers = auth.get_headers()
-        _header_json = json.dumps(self._headers, indent=4)
-        _logger.debug(_header_json)
+        return url
 
     def api_put(
         self,
@@ -78,13 +175,16 @@ class ApiService:
         preview: bool = False,
         api_version=_API_VERSION,
     ):
-        if preview:
-            url = f"{self.host}/api/{api_version}/{_PREVIEW}/{api}/{function}"
-        else:
-            url = f"{self.host}/api/{api_version}/{api}/{function}"
+        url = self.get_url(api, function, preview, api_version)
 
         response = _base_api_put(
-            url=url, headers=self._headers, json=data, params=params
+            url=url,
+            headers=self.headers,
+            json=data,
+            params=params,
+            session=self._session,
+            retry_policy=self.retry_policy,
+            rate_limit=functools.partial(rate_limiter.acquire, api),
         )
 
         try:
@@ -105,16 +205,16 @@ class ApiService:
         preview: bool = False,
         api_version=_API_VERSION,
     ):
-        if preview:
-            url = f"{self.host}/api/{api_version}/{_PREVIEW}/{api}"
-        else:
-            url = f"{self.host}/api/{api_version}/{api}"
-
-        if function:
-            url = f"{url}/{function}"
+        url = self.get_url(api, function, preview, api_version)
 
         response = _base_api_get(
-            url=url, headers=self._headers, json=data, params=params
+            url=url,
+            headers=self.headers,
+            json=data,
+            params=params,
+            session=self._session,
+            retry_policy=self.retry_policy,
+            rate_limit=functools.partial(rate_limiter.acquire, api),
         )
 
         try:
@@ -135,13 +235,16 @@ class ApiService:
         preview: bool = False,
         api_version=_API_VERSION,
     ):
-        if preview:
-            url = f"{self.host}/api/{api_version}/{_PREVIEW}/{api}/{function}"
-        else:
-            url = f"{self.host}/api/{api_version}/{api}/{function}"
+        url = self.get_url(api, function, preview, api_version)
 
         response = _base_api_delete(
-            url=url, headers=self._headers, json=data, params=params
+            url=url,
+            headers=self.headers,
+            json=data,
+            params=params,
+            session=self._session,
+            retry_policy=self.retry_policy,
+            rate_limit=functools.partial(rate_limiter.acquire, api),
         )
 
         try:
@@ -161,15 +264,16 @@ class ApiService:
         preview: bool = False,
         api_version=_API_VERSION,
     ):
-        if preview:
-            url = f"{self.host}/api/{api_version}/{_PREVIEW}/{api}"
-        else:
-            url = f"{self.host}/api/{api_version}/{api}"
+        url = self.get_url(api, function, preview, api_version)
 
-        if function:
-            url = f"{url}/{function}"
-
-        response = _base_api_post(url=url, headers=self._headers, json=data)
+        response = _base_api_post(
+            url=url,
+            headers=self.headers,
+            json=data,
+            session=self._session,
+            retry_policy=self.retry_policy,
+            rate_limit=functools.partial(rate_limiter.acquire, api),
+        )
 
         try:
             json = response.json()
@@ -179,3 +283,37 @@ class ApiService:
             raise ex
 
         return json
+
+
+class LazyApiService:
+    """
+    factory:type=ApiService     callable that creates the ApiService
+
+    Proxy for an ApiService that is only created, and so only authenticates, the
+    first time it's used. Modules hold the process wide shared instance so that
+    importing autobricks doesn't make any network calls.
+    """
+
+    def __init__(self, factory=ApiService):
+        self._factory = factory
+        self._api_service: ApiService = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ApiService:
+        if self._api_service is None:
+            with self._lock:
+                if self._api_service is None:
+                    self._api_service = self._factory()
+
+        return self._api_service
+
+    def reset(self):
+        """
+        Discards the ApiService so that it's created again on next use,
+        e.g. after the configuration has changed.
+        """
+        with self._lock:
+            self._api_service = None
+
+    def __getattr__(self, name: str):
+        return getattr(self.get(), name)
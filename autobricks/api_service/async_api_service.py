@@ -0,0 +1,192 @@
+import asyncio
+from .api_service import ApiService, _API_VERSION
+from ._base_api import _ssl_verify
+from ._metrics import metrics
+from ._rate_limiter import rate_limiter
+from . import autobricks_logging
+from ._exceptions import AutobricksResponseJsonError
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+_logger = autobricks_logging.get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 100
+
+
+class AsyncApiService:
+    """
+    api_service:ApiService=None     service to take the host, authentication and retry policy from
+    max_connections:int=100         maximum number of concurrent connections to the host
+    transport=None                  httpx transport to send the requests with, defaults to http
+
+    asyncio version of the ApiService so that a single process can keep hundreds
+    of requests in flight. URLs, authentication headers, retries, rate limiting and
+    json errors behave the same as the ApiService. Requires the httpx package,
+    pip install autobricks[async].
+    """
+
+    def __init__(
+        self,
+        api_service: ApiService = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        transport=None,
+    ):
+        _logger.info("Initialising AsyncApiService")
+        self._api_service = api_service if api_service is not None else ApiService()
+        self.max_connections = max_connections
+        self._transport = transport
+        self._client = None
+        self._client_loop = None
+
+    def _get_client(self):
+        if httpx is None:
+            raise ImportError(
+                "AsyncApiService requires httpx, install it with pip install autobricks[async]"
+            )
+
+        # httpx clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            )
+            self._client = httpx.AsyncClient(
+                limits=limits,
+                verify=_ssl_verify,
+                timeout=None,
+                transport=self._transport,
+            )
+            self._client_loop = loop
+
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+
+    async def _request(self, method: str, api: str, url: str, data=None, params=None):
+        client = self._get_client()
+        retry_policy = self._api_service.retry_policy
+        attempt = 0
+
+        while True:
+            await asyncio.sleep(rate_limiter.reserve(api))
+            metrics.increment("requests")
+            response = None
+            try:
+                response = await client.request(
+                    method,
+                    url,
+                    headers=self._api_service.headers,
+                    json=data,
+                    params=params,
+                )
+                response.raise_for_status()
+                return response
+
+            except httpx.HTTPStatusError as e:
+                status_code = e.response.status_code
+                if attempt >= retry_policy.max_retries or not (
+                    retry_policy.is_retryable(method, status_code=status_code)
+                ):
+                    msg = f"{status_code} error at {url} {e.response.text}"
+                    _logger.error(msg)
+                    raise e
+                reason = f"{status_code} error"
+
+            except httpx.TransportError as e:
+                connected = not isinstance(
+                    e, (httpx.ConnectError, httpx.ConnectTimeout)
+                )
+                if attempt >= retry_policy.max_retries or not (
+                    retry_policy.is_retryable_connection_error(method, connected)
+                ):
+                    raise e
+                reason = type(e).__name__
+
+            wait = retry_policy.backoff(attempt, response)
+            attempt += 1
+            metrics.increment("retries")
+            _logger.info(
+                f"Retrying {method} {url} after {reason} in {wait:.2f}s (retry {attempt} of {retry_policy.max_retries})"
+            )
+            await asyncio.sleep(wait)
+
+    async def _api_request(
+        self,
+        method: str,
+        api: str,
+        function: str,
+        data=None,
+        params=None,
+        preview: bool = False,
+        api_version=_API_VERSION,
+    ):
+        url = self._api_service.get_url(api, function, preview, api_version)
+        response = await self._request(method, api, url, data, params)
+
+        try:
+            json = response.json()
+        except Exception:
+            ex = AutobricksResponseJsonError(url, method, data, response.text)
+            _logger.error(ex.message)
+            raise ex
+
+        return json
+
+    async def api_put(
+        self,
+        api: str,
+        function: str,
+        data: dict = None,
+        params=None,
+        preview: bool = False,
+        api_version=_API_VERSION,
+    ):
+        return await self._api_request(
+            "PUT", api, function, data, params, preview, api_version
+        )
+
+    async def api_get(
+        self,
+        api: str,
+        function: str,
+        data: dict = None,
+        params=None,
+        preview: bool = False,
+        api_version=_API_VERSION,
+    ):
+        return await self._api_request(
+            "GET", api, function, data, params, preview, api_version
+        )
+
+    async def api_delete(
+        self,
+        api: str,
+        function: str,
+        data: dict = None,
+        params=None,
+        preview: bool = False,
+        api_version=_API_VERSION,
+    ):
+        return await self._api_request(
+            "DELETE", api, function, data, params, preview, api_version
+        )
+
+    async def api_post(
+        self,
+        api: str,
+        function: str,
+        data: dict,
+        preview: bool = False,
+        api_version=_API_VERSION,
+    ):
+        return await self._api_request(
+            "POST", api, function, data, None, preview, api_version
+        )
@@ -35,5 +35,8 @@ setup(
           'PyYAML',
           'adal'
       ],
+    extras_require={
+          'async': ['httpx']
+      },
     zip_safe=False
 )
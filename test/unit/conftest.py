@@ -0,0 +1,25 @@
+import pytest
+
+
+class StepStates:
+    """Fake api objects that each step through their states each time the waiter sleeps"""
+
+    def __init__(self, states: dict):
+        self.states = states
+        self.polls = 0
+
+    def state(self, object_id):
+        states = self.states[object_id]
+        return states[min(self.polls, len(states) - 1)]
+
+    def tick(self, *_):
+        self.polls += 1
+
+    async def tick_async(self, *_):
+        self.tick()
+
+
+@pytest.fixture
+def step_states():
+    """Creates the fake that steps objects through their states, patch sleep with its tick"""
+    return StepStates
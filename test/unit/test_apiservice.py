@@ -1,12 +1,21 @@
 
 from autobricks.api_service import (
     ApiService, 
+    AsyncApiService,
+    LazyApiService,
     configuration, 
-    AutobricksConfigurationInvalid
+    metrics,
+    RateLimiter,
+    AutobricksConfigurationInvalid,
+    AutobricksResponseJsonError,
 )
 from autobricks.api_service._auth_factory import AuthenticationType
+from autobricks.api_service import _base_api
+from autobricks.api_service import api_service as api_service_module
+from unittest.mock import Mock
 from dataclasses import dataclass
 import pytest
+import asyncio
 import os 
 
 
@@ -229,4 +238,303 @@ def test_api_service_default_configuration():
     api_host = api_svc.auth_type
 
     assert api_svc.host == os.getenv("DATABRICKS_API_HOST")
-    assert api_svc.auth_type.name == os.getenv("AUTH_TYPE")
\ No newline at end of file
+    assert api_svc.auth_type.name == os.getenv("AUTH_TYPE")
+
+def test_api_service_shares_session(config):
+    """To reuse connections to the workspace host
+        Given two ApiServices with the same pool configuration
+        Then they should share the same pooled http session
+    """
+    api_svc_1 = ApiService(config.config)
+    api_svc_2 = ApiService(config.config)
+
+    assert api_svc_1._session is api_svc_2._session
+
+
+def test_api_service_session_pool_size(config):
+    """So that the connection pool can be sized for concurrent deployments
+        Given a configuration with a pool_maxsize
+        Then the http session adapters should use that pool size
+    """
+    tconfig = dict(config.config)
+    tconfig["pool_maxsize"] = "64"
+
+    api_svc = ApiService(config=tconfig)
+    adapter = api_svc._session.get_adapter(config.host)
+
+    assert adapter._pool_maxsize == 64
+
+
+def test_api_service_pool_size_invalid_exception(config):
+    """So that ApiService configuration is usable
+        Given a configuration with a pool_maxsize that isn't a number
+        Then a meaningfull exception should be thrown
+    """
+    var = "pool_maxsize"
+    tconfig = dict(config.config)
+    tconfig[var] = "lots"
+
+    msg = f"Autobricks configuration variable '{var}' is not valid. {var}=lots."
+    with pytest.raises(AutobricksConfigurationInvalid, match=msg):
+        api_svc = ApiService(config=tconfig)
+
+
+
+@pytest.fixture
+def retry_api_service(config, mocker):
+    mocker.patch("autobricks.api_service._base_api.time.sleep")
+    tconfig = dict(config.config)
+    tconfig["max_retries"] = "2"
+    return ApiService(config=tconfig)
+
+
+def test_get_retry_rate_limited(requests_mock, config, retry_api_service):
+    """So that bulk operations aren't aborted by throttling
+        Given a GET that is rate limited with a Retry-After header
+        Then the request should be retried after the Retry-After seconds
+    """
+    url = f"{config.host}/api/{config.version}/{config.endpoint}/{config.function}"
+    requests_mock.get(
+        url,
+        [
+            {"status_code": 429, "headers": {"Retry-After": "7"}},
+            {"json": config.data},
+        ],
+    )
+    retries = metrics.get("retries")
+
+    response = retry_api_service.api_get(config.endpoint, config.function)
+
+    assert config.data == response
+    assert requests_mock.call_count == 2
+    assert metrics.get("retries") == retries + 1
+    _base_api.time.sleep.assert_called_once_with(7.0)
+
+
+def test_get_retry_exhausted(requests_mock, config, retry_api_service):
+    """So that persistent failures are still reported
+        Given a GET that keeps failing with a transient error
+        Then the request should be retried max_retries times and the error raised
+    """
+    url = f"{config.host}/api/{config.version}/{config.endpoint}/{config.function}"
+    requests_mock.get(url, status_code=503, text="unavailable")
+
+    with pytest.raises(Exception) as e:
+        retry_api_service.api_get(config.endpoint, config.function)
+
+    assert e.value.response.status_code == 503
+    assert requests_mock.call_count == 3
+
+
+def test_post_not_retried_server_error(requests_mock, config, retry_api_service):
+    """So that non idempotent requests aren't applied twice
+        Given a POST that fails with a server error
+        Then the request should not be retried
+    """
+    url = f"{config.host}/api/{config.version}/{config.endpoint}/{config.function}"
+    requests_mock.post(url, status_code=503, text="unavailable")
+
+    with pytest.raises(Exception):
+        retry_api_service.api_post(config.endpoint, config.function, config.data)
+
+    assert requests_mock.call_count == 1
+
+
+def test_post_retry_rate_limited(requests_mock, config, retry_api_service):
+    """So that bulk operations aren't aborted by throttling
+        Given a POST that is rate limited
+        Then the request should be retried since it wasn't processed
+    """
+    url = f"{config.host}/api/{config.version}/{config.endpoint}/{config.function}"
+    requests_mock.post(url, [{"status_code": 429}, {"json": config.data}])
+
+    response = retry_api_service.api_post(
+        config.endpoint, config.function, config.data
+    )
+
+    assert config.data == response
+    assert requests_mock.call_count == 2
+
+
+def test_rate_limiter_unlimited():
+    """So that rate limiting is opt in
+        Given a rate limiter without a rate for an endpoint family
+        Then requests for the family should never wait
+    """
+    limiter = RateLimiter(rates={"jobs": 1})
+
+    waited = sum(limiter.acquire("workspace") for _ in range(100))
+
+    assert waited == 0
+
+
+def test_rate_limiter_waits(mocker):
+    """So that parallel deployments don't trip the workspace quotas
+        Given a rate limiter with a rate for an endpoint family
+        Then requests beyond the rate should wait and the wait recorded in the metrics
+    """
+    clock = [0.0]
+
+    def _sleep(seconds):
+        clock[0] += seconds
+
+    mocker.patch(
+        "autobricks.api_service._rate_limiter.time.monotonic", lambda: clock[0]
+    )
+    sleep = mocker.patch(
+        "autobricks.api_service._rate_limiter.time.sleep", side_effect=_sleep
+    )
+    limiter = RateLimiter(default_rate=100, rates={"workspace": 2})
+    wait_seconds = metrics.get("rate_limiter_wait_seconds.workspace")
+
+    waited = [limiter.acquire("workspace") for _ in range(3)]
+
+    assert waited[:2] == [0, 0]
+    assert waited[2] == 0.5
+    sleep.assert_called_once_with(0.5)
+    assert metrics.get("rate_limiter_wait_seconds.workspace") > wait_seconds
+
+
+def test_api_service_rate_limited(requests_mock, config, api_service, mocker):
+    """So that every module shares the same request quota
+        Given an api call
+        Then it should take a token from the process wide rate limiter for its endpoint family
+    """
+    acquire = mocker.patch("autobricks.api_service.api_service.rate_limiter.acquire")
+    requests_mock.get(
+        f"{config.host}/api/{config.version}/{config.endpoint}/{config.function}",
+        json=config.data,
+    )
+
+    api_service.api_get(config.endpoint, config.function)
+
+    acquire.assert_called_once_with(config.endpoint)
+
+
+
+def test_api_service_rate_limited_retries(requests_mock, config, retry_api_service, mocker):
+    """So that retries don't exceed the rate while the service is throttling
+        Given an api call that is retried after a 429
+        Then every attempt should take a token from the rate limiter
+    """
+    acquire = mocker.patch("autobricks.api_service.api_service.rate_limiter.acquire")
+    requests_mock.get(
+        f"{config.host}/api/{config.version}/{config.endpoint}/{config.function}",
+        [{"status_code": 429}, {"json": config.data}],
+    )
+
+    retry_api_service.api_get(config.endpoint, config.function)
+
+    assert acquire.call_count == 2
+    acquire.assert_called_with(config.endpoint)
+
+def test_async_get_data(config, api_service):
+    """So that many requests can be kept in flight from one process
+        Given an AsyncApiService
+        Then it should build the same urls and auth headers as the ApiService
+    """
+    httpx = pytest.importorskip("httpx")
+    requests = []
+
+    def _handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=config.data)
+
+    async_api_svc = AsyncApiService(api_service, transport=httpx.MockTransport(_handler))
+
+    response = asyncio.run(
+        async_api_svc.api_get(config.endpoint, config.function, preview=True)
+    )
+
+    assert config.data == response
+    assert str(requests[0].url) == (
+        f"{config.host}/api/{config.version}/preview/{config.endpoint}/{config.function}"
+    )
+    assert requests[0].headers["Authorization"] == api_service.headers["Authorization"]
+
+
+def test_async_post_retry_rate_limited(config, api_service, mocker):
+    """So that bulk async operations aren't aborted by throttling
+        Given an async POST that is rate limited
+        Then the request should be retried
+    """
+    httpx = pytest.importorskip("httpx")
+    mocker.patch.object(api_service.retry_policy, "backoff_factor", 0)
+    responses = [httpx.Response(429), httpx.Response(200, json=config.data)]
+    async_api_svc = AsyncApiService(
+        api_service, transport=httpx.MockTransport(lambda r: responses.pop(0))
+    )
+
+    response = asyncio.run(
+        async_api_svc.api_post(config.endpoint, config.function, config.data)
+    )
+
+    assert config.data == response
+    assert responses == []
+
+
+def test_async_json_exception(config, api_service):
+    """So that errors are consistent with the ApiService
+        Given an async response that isn't json
+        Then an AutobricksResponseJsonError should be raised
+    """
+    httpx = pytest.importorskip("httpx")
+    async_api_svc = AsyncApiService(
+        api_service,
+        transport=httpx.MockTransport(lambda r: httpx.Response(200, text="not json")),
+    )
+
+    with pytest.raises(AutobricksResponseJsonError):
+        asyncio.run(async_api_svc.api_get(config.endpoint, config.function))
+
+
+def test_api_service_authenticates_on_first_use(config, mocker):
+    """So that creating an ApiService doesn't make network calls
+        Given a new ApiService
+        Then it should only authenticate when the headers are first used
+    """
+    get_auth = mocker.spy(api_service_module.auth_factory, "get_auth")
+    api_svc = ApiService(config.config)
+
+    assert not get_auth.called
+
+    api_svc.headers
+    api_svc.headers
+
+    get_auth.assert_called_once()
+
+
+def test_lazy_api_service():
+    """So that importing autobricks doesn't make network calls
+        Given a LazyApiService
+        Then the ApiService should only be created once on first use
+    """
+    api_svc = Mock()
+    factory = Mock(return_value=api_svc)
+    lazy_api_svc = LazyApiService(factory)
+
+    assert not factory.called
+
+    lazy_api_svc.api_get("endpoint", "function")
+    lazy_api_svc.api_post("endpoint", "function", {})
+
+    factory.assert_called_once_with()
+    api_svc.api_get.assert_called_once_with("endpoint", "function")
+
+
+def test_metrics_thread_counters():
+    """So that bulk operations can report the retries of each item
+        Given counters incremented on different threads
+        Then the thread counters should only include the current thread's increments
+    """
+    import threading
+    from autobricks.api_service._metrics import ApiMetrics
+
+    thread_metrics = ApiMetrics()
+    thread_metrics.increment("retries")
+    worker = threading.Thread(target=lambda: thread_metrics.increment("retries", 2))
+    worker.start()
+    worker.join()
+
+    assert thread_metrics.get("retries") == 3
+    assert thread_metrics.get_thread("retries") == 1
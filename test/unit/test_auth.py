@@ -7,8 +7,11 @@ from autobricks.api_service._auth import (
     SPMgmtEndpointAuth
 )
 from autobricks.api_service import configuration
+from autobricks.api_service._token_cache import TokenProvider
 from dataclasses import dataclass
 import pytest
+import threading
+import time
 
 
 @pytest.fixture
@@ -70,8 +73,112 @@ def test_user_auth_header_keyerror(config):
              a informative expception 
     """
     
-    del config.config["dbutilstoken"]
+    tconfig = dict(config.config)
+    del tconfig["dbutilstoken"]
     a = Mock()
     a.side_effect = KeyError("dbutilstoken key not found in UserAuth parameters")
     with pytest.raises(KeyError, match="dbutilstoken key not found in UserAuth parameters"):
-        auth = UserAuth(config.config)
+        auth = UserAuth(tconfig)
+
+
+@pytest.fixture
+def sp_token_url(config):
+    tenant_id = config.config["tenant_id"]
+    return f"https://login.microsoftonline.com/{tenant_id}/oauth2/token"
+
+
+def _token(access_token: str, expires_in: int):
+    return {"access_token": access_token, "expires_on": str(int(time.time()) + expires_in)}
+
+
+def test_sp_auth_header(requests_mock, config, sp_token_url):
+    """When: the authorisation type is service principal
+       Then: the SPAuth.get_headers() should return
+             a bearer token header holding the AD token
+    """
+    requests_mock.get(sp_token_url, json=_token("token1", 3600))
+
+    auth = SPAuth(config.config)
+
+    assert auth.get_headers() == {"Authorization": "Bearer token1"}
+    assert auth.get_headers() == {"Authorization": "Bearer token1"}
+    assert requests_mock.call_count == 1
+
+
+def test_sp_auth_header_expired(requests_mock, config, sp_token_url):
+    """When: the service principal AD token has expired
+       Then: the SPAuth.get_headers() should refresh the token
+             before returning the bearer token header
+    """
+    requests_mock.get(
+        sp_token_url, [{"json": _token("token1", 0)}, {"json": _token("token2", 3600)}]
+    )
+
+    auth = SPAuth(config.config)
+
+    assert auth.get_headers() == {"Authorization": "Bearer token2"}
+    assert requests_mock.call_count == 2
+
+
+def test_sp_auth_token_cache(requests_mock, config, sp_token_url, tmp_path):
+    """When: a token cache is configured
+       Then: a new SPAuth should reuse the valid cached token
+             and the cache should be encrypted
+    """
+    pytest.importorskip("cryptography")
+    requests_mock.get(sp_token_url, json=_token("token1", 3600))
+    tconfig = dict(config.config)
+    tconfig["token_cache"] = str(tmp_path / "token_cache")
+
+    SPAuth(tconfig)
+    auth = SPAuth(tconfig)
+
+    assert auth.get_headers() == {"Authorization": "Bearer token1"}
+    assert requests_mock.call_count == 1
+    assert b"token1" not in (tmp_path / "token_cache").read_bytes()
+
+
+def test_token_provider_background_refresh():
+    """When: a token is close to expiring
+       Then: the TokenProvider should return the current token
+             and refresh it in the background
+    """
+    now = time.time()
+    fetch = Mock(side_effect=[("token1", now + 120), ("token2", now + 3600)])
+    provider = TokenProvider(fetch)
+
+    assert provider.get_token() == "token1"
+    assert provider.get_token() == "token1"
+    provider._refresh_thread.join()
+
+    assert provider.get_token() == "token2"
+    assert fetch.call_count == 2
+
+
+def test_token_provider_background_refresh_does_not_block():
+    """When: a token is close to expiring and fetching a new one is slow
+       Then: the TokenProvider should keep returning the current token
+             without waiting for the background refresh
+    """
+    now = time.time()
+    release = threading.Event()
+
+    def fetch():
+        if fetch.calls:
+            release.wait(5)
+            return "token2", now + 3600
+        fetch.calls += 1
+        return "token1", now + 120
+
+    fetch.calls = 0
+    provider = TokenProvider(fetch)
+
+    start = time.monotonic()
+    tokens = [provider.get_token() for _ in range(5)]
+    elapsed = time.monotonic() - start
+    release.set()
+    provider._refresh_thread.join()
+
+    assert tokens == ["token1"] * 5
+    assert elapsed < 1
+    assert provider.get_token() == "token2"
@@ -0,0 +1,92 @@
+from autobricks import Cluster
+from autobricks.Cluster import ClusterState
+import pytest
+
+
+@pytest.fixture
+def clusters(mocker, step_states):
+    def _clusters(states: dict):
+        steps = step_states(states)
+
+        def cluster_get(cluster_id: str):
+            state = steps.state(cluster_id)
+            return {
+                "cluster_id": cluster_id,
+                "state": state,
+                "state_message": "message",
+            }
+
+        def cluster_list():
+            return {"clusters": [cluster_get(c) for c in states]}
+
+        get = mocker.patch.object(Cluster, "cluster_get", side_effect=cluster_get)
+        list = mocker.patch.object(Cluster, "cluster_list", side_effect=cluster_list)
+        sleep = mocker.patch.object(Cluster.time, "sleep", side_effect=steps.tick)
+        return get, list, sleep
+
+    return _clusters
+
+
+def test_cluster_wait_until_state_running(clusters):
+    """So that waiting on a running cluster doesn't add latency
+    Given a cluster that's already running
+    Then it returns straight away without sleeping
+    """
+    get, _, sleep = clusters({"a": ["RUNNING"]})
+
+    Cluster.cluster_wait_until_state("a", ClusterState.RUNNING)
+
+    assert get.call_count == 1
+    sleep.assert_not_called()
+
+
+def test_clusters_wait_until_state(clusters):
+    """So that pipelines can start many clusters and wait on them together
+    Given several clusters starting
+    Then each check lists the clusters once and the interval backs off while nothing changes
+    """
+    get, list, sleep = clusters(
+        {
+            "a": ["PENDING", "RUNNING"],
+            "b": ["PENDING", "PENDING", "PENDING", "PENDING", "PENDING", "RUNNING"],
+            "c": ["PENDING", "PENDING", "RUNNING"],
+        }
+    )
+
+    result = Cluster.clusters_wait_until_state(
+        ["a", "b", "c"], ClusterState.RUNNING, max_wait_seconds=2
+    )
+
+    assert {c: r["state"] for c, r in result.items()} == {
+        "a": "RUNNING",
+        "b": "RUNNING",
+        "c": "RUNNING",
+    }
+    assert list.call_count == 3
+    assert get.call_count == 3
+    assert [c.args[0] for c in sleep.call_args_list] == [1, 1, 1, 1.5, 2]
+
+
+def test_clusters_wait_until_state_errors(clusters):
+    """So that one failed cluster doesn't hide the state of the others
+    Given clusters where one errors
+    Then the others are waited for and the error is raised at the end
+    """
+    _, _, sleep = clusters({"a": ["PENDING", "ERROR"], "b": ["PENDING", "RUNNING"]})
+
+    with pytest.raises(Exception, match="cluster_id a is in error state"):
+        Cluster.clusters_wait_until_state(["a", "b"], ClusterState.RUNNING)
+
+    assert sleep.call_count == 1
+
+
+def test_clusters_wait_until_state_timeout(clusters, mocker):
+    """So that pipelines don't hang on a cluster that never starts
+    Given a timeout shorter than the cluster takes to start
+    Then a TimeoutError is raised
+    """
+    clusters({"a": ["PENDING"]})
+    mocker.patch.object(Cluster.time, "monotonic", side_effect=[0, 1, 2, 3])
+
+    with pytest.raises(TimeoutError):
+        Cluster.cluster_wait_until_state("a", ClusterState.RUNNING, timeout=2)
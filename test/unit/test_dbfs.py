@@ -137,36 +137,34 @@ def test_dbfs_read(requests_mock, config):
     assert expected == result
 
 
-def test_dbfs_download_large(requests_mock, config):
+def test_dbfs_download_large(requests_mock, config, mocker):
 
     from_path = "/path/of/file"
     to_path = "./text.txt"
-    length = 1024
-    data = "SGVsbG8gV29ybGQ="
-    url = f"{config.host}/api/{config.version}/{config.endpoint}/read"
+    content = b"Hello World"
+    block_size = 4
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
+    mocker.patch.object(Dbfs, "_MAX_BLOCK_SIZE", block_size)
 
-    expected = [
-        {"bytes_read": length, "data": data}, 
-        {"bytes_read": 4,      "data": data}
-    ]
-
-    content = data.encode("utf-8")
-    content = base64.b64decode(content)
+    def _read(request, context):
+        offset = request.json()["offset"]
+        data = content[offset : offset + block_size]
+        return {"bytes_read": len(data), "data": base64.b64encode(data).decode()}
 
-    for e in expected:
-        requests_mock.get(url, json=e)
+    requests_mock.get(f"{url}/get-status", json={"file_size": len(content)})
+    requests_mock.get(f"{url}/read", json=_read)
 
     with patch("builtins.open", mock_open()) as mocked_file:
 
-        Dbfs.dbfs_download(from_path, to_path)
+        Dbfs.dbfs_download(from_path, to_path, max_workers=3)
 
         mocked_file.assert_called_once_with(to_path, "wb")
 
         handle = mocked_file()
+        handle.truncate.assert_called_once_with(len(content))
         handle.write.assert_has_calls(
-            [
-                mock.call(content)
-            ]
+            [mock.call(b"Hell"), mock.call(b"o Wo"), mock.call(b"rld")],
+            any_order=True,
         )
 
 
@@ -174,22 +172,17 @@ def test_dbfs_download(requests_mock, config):
 
     from_path = "/path/of/file"
     to_path = "./text.txt"
-    length = 1024
     data = "SGVsbG8gV29ybGQ="
-    url = f"{config.host}/api/{config.version}/{config.endpoint}/read"
-
-    expected = [
-        {"bytes_read": length, "data": data}, 
-        {"bytes_read": 4,      "data": data}
-    ]
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
 
     content = data.encode("utf-8")
     content = base64.b64decode(content)
 
+    requests_mock.get(f"{url}/get-status", json={"file_size": len(content)})
+    requests_mock.get(f"{url}/read", json={"bytes_read": len(content), "data": data})
+
     with patch("builtins.open", mock_open()) as mocked_file:
 
-        for e in expected:
-            requests_mock.get(url, json=e)
         Dbfs.dbfs_download(from_path, to_path)
 
         mocked_file.assert_called_once_with(to_path, "wb")
@@ -200,6 +193,19 @@ def test_dbfs_download(requests_mock, config):
         handle.write.assert_called_once_with(content)
 
 
+def test_dbfs_download_size_mismatch(requests_mock, config):
+
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
+    requests_mock.get(f"{url}/get-status", json={"file_size": 20})
+    requests_mock.get(
+        f"{url}/read", json={"bytes_read": 11, "data": "SGVsbG8gV29ybGQ="}
+    )
+
+    with patch("builtins.open", mock_open()):
+        with pytest.raises(Exception, match="Downloaded 11 bytes"):
+            Dbfs.dbfs_download("/path/of/file", "./text.txt")
+
+
 def test_dbfs_find_file():
 
     result = Dbfs.find_file("test*dbfs.py", "./test/unit")
@@ -228,25 +234,17 @@ def test_read_file_block():
 
 def test_dbfs_upload(requests_mock, config):
 
-    data = "booyakashaan!"
     path = "/path/of/file.txt"
     datarb = b"booyakashaan!"
 
-    content = data.encode("utf-8")
-    content = base64.b64decode(content)
-
-    create_expected = {"handle": 1}
     expected = {}
 
-    requests_mock.post(
-        f"{config.host}/api/{config.version}/{config.endpoint}/create",
-        json=create_expected,
-    )
-    requests_mock.post(
-        f"{config.host}/api/{config.version}/{config.endpoint}/add-block", json={}
+    put = requests_mock.post(
+        f"{config.host}/api/{config.version}/{config.endpoint}/put", json=expected
     )
-    requests_mock.post(
-        f"{config.host}/api/{config.version}/{config.endpoint}/close", json={}
+    create = requests_mock.post(
+        f"{config.host}/api/{config.version}/{config.endpoint}/create",
+        json={"handle": 1},
     )
 
     with patch("builtins.open", mock_open(read_data=datarb)) as mocked_file:
@@ -255,7 +253,155 @@ def test_dbfs_upload(requests_mock, config):
         mocked_file.assert_called_once_with(path, "rb")
 
         handle = mocked_file()
-        handle.read.assert_called_with(1024)
-        handle.read.assert_called_with(1024)
+        handle.read.assert_called_with(Dbfs._MAX_BLOCK_SIZE)
 
     assert result == expected
+    assert put.call_count == 1
+    assert not create.called
+    assert put.last_request.json() == {
+        "path": path,
+        "contents": base64.b64encode(datarb).decode(),
+        "overwrite": True,
+    }
+
+
+def test_dbfs_upload_blocks(requests_mock, config, mocker):
+
+    path = "/path/of/file.txt"
+    datarb = b"booyakashaan!"
+    block_size = 5
+    mocker.patch.object(Dbfs, "_MAX_BLOCK_SIZE", block_size)
+
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
+    requests_mock.post(f"{url}/create", json={"handle": 1})
+    add_block = requests_mock.post(f"{url}/add-block", json={})
+    close = requests_mock.post(f"{url}/close", json={})
+
+    with patch("builtins.open", mock_open(read_data=datarb)):
+        result = Dbfs.dbfs_upload(path, path, True)
+
+    blocks = [
+        base64.b64decode(r.json()["data"]) for r in add_block.request_history
+    ]
+
+    assert result == {}
+    assert blocks == [b"booya", b"kasha", b"an!"]
+    assert close.last_request.json() == {"handle": 1}
+
+
+def test_dbfs_upload_files(requests_mock, config, tmp_path):
+
+    for name in ["a.whl", "b.whl", "c.whl", "d.txt"]:
+        (tmp_path / name).write_bytes(b"wheel")
+
+    put = requests_mock.post(
+        f"{config.host}/api/{config.version}/{config.endpoint}/put", json={}
+    )
+
+    result = Dbfs.dbfs_upload_files("*.whl", str(tmp_path), "/wheels", max_workers=4)
+
+    uploaded = sorted(r.json()["path"] for r in put.request_history)
+
+    assert uploaded == ["/wheels/a.whl", "/wheels/b.whl", "/wheels/c.whl"]
+    assert result["succeeded"] == 3
+    assert result["failed"] == 0
+    assert result["bytes"] == 15
+
+
+def test_dbfs_upload_files_failure(requests_mock, config, tmp_path):
+
+    for name in ["a.whl", "b.whl"]:
+        (tmp_path / name).write_bytes(name.encode())
+
+    url = f"{config.host}/api/{config.version}/{config.endpoint}/put"
+    requests_mock.post(
+        url,
+        additional_matcher=lambda r: r.json()["path"] == "/wheels/a.whl",
+        json={},
+    )
+    requests_mock.post(
+        url,
+        additional_matcher=lambda r: r.json()["path"] == "/wheels/b.whl",
+        status_code=500,
+        text="an error occurred",
+    )
+
+    result = Dbfs.dbfs_upload_files(
+        "*.whl", str(tmp_path), "/wheels", max_workers=2, raise_errors=False
+    )
+    status = {r["to_path"]: r["status"] for r in result["files"]}
+
+    assert status == {"/wheels/a.whl": "succeeded", "/wheels/b.whl": "failed"}
+    assert result["succeeded"] == 1
+    assert result["failed"] == 1
+
+    with pytest.raises(Exception, match="Failed to upload"):
+        Dbfs.dbfs_upload_files("*.whl", str(tmp_path), "/wheels", max_workers=2)
+
+
+def test_dbfs_upload_resumable(requests_mock, config, mocker, tmp_path):
+
+    mocker.patch.object(Dbfs, "_MAX_BLOCK_SIZE", 5)
+    from_path = tmp_path / "file.txt"
+    from_path.write_bytes(b"booyakashaan!")
+    to_path = "/path/of/file.txt"
+
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
+    requests_mock.post(f"{url}/create", json={"handle": 1})
+    add_block = requests_mock.post(
+        f"{url}/add-block",
+        [{"json": {}}, {"status_code": 503, "text": "unavailable"}, {"json": {}}],
+    )
+    requests_mock.post(f"{url}/close", json={})
+    requests_mock.get(f"{url}/get-status", json={"file_size": 13})
+
+    with pytest.raises(Exception):
+        Dbfs.dbfs_upload(str(from_path), to_path, resumable=True)
+
+    checkpoint_path = tmp_path / f"file.txt{Dbfs._CHECKPOINT_EXTENSION}"
+    assert checkpoint_path.exists()
+
+    Dbfs.dbfs_upload(str(from_path), to_path, resumable=True)
+
+    blocks = [
+        base64.b64decode(r.json()["data"])
+        for r in add_block.request_history
+        if r is not add_block.request_history[1]
+    ]
+
+    assert blocks == [b"booya", b"kasha", b"an!"]
+    assert not checkpoint_path.exists()
+
+
+def test_dbfs_download_resumable(requests_mock, config, mocker, tmp_path):
+
+    mocker.patch.object(Dbfs, "_MAX_BLOCK_SIZE", 4)
+    mocker.patch.object(Dbfs._api_service.retry_policy, "max_retries", 0)
+    content = b"Hello World"
+    to_path = tmp_path / "file.txt"
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
+    offsets = []
+
+    def _read(request, context):
+        offset = request.json()["offset"]
+        offsets.append(offset)
+        if offset == 8 and offsets.count(8) == 1:
+            context.status_code = 503
+            return {}
+        data = content[offset : offset + 4]
+        return {"bytes_read": len(data), "data": base64.b64encode(data).decode()}
+
+    requests_mock.get(
+        f"{url}/get-status",
+        json={"file_size": len(content), "modification_time": 1},
+    )
+    requests_mock.get(f"{url}/read", json=_read)
+
+    with pytest.raises(Exception):
+        Dbfs.dbfs_download("/path/of/file", str(to_path), resumable=True)
+
+    Dbfs.dbfs_download("/path/of/file", str(to_path), resumable=True)
+
+    assert to_path.read_bytes() == content
+    assert offsets == [0, 4, 8, 8]
+    assert not (tmp_path / f"file.txt{Dbfs._CHECKPOINT_EXTENSION}").exists()
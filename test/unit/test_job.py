@@ -0,0 +1,402 @@
+from autobricks import Job
+import asyncio
+import json
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset_job_ids():
+    Job.job_ids_reset()
+    yield
+    Job.job_ids_reset()
+
+
+def _jobs_url(function: str):
+    return Job._api_service.get_url(
+        Job.endpoint, function, api_version=Job._JOBS_API_VERSION
+    )
+
+
+def _job(name: str, timeout: int = 0):
+    return {
+        "name": name,
+        "timeout_seconds": timeout,
+        "tasks": [{"task_key": name, "notebook_task": {"notebook_path": "/a"}}],
+    }
+
+
+def _remote_job(job_id: int, settings: dict):
+    """Remote jobs have defaults added that aren't in the local definitions"""
+    settings = json.loads(json.dumps(settings))
+    settings["max_concurrent_runs"] = 1
+    settings["format"] = "MULTI_TASK"
+    for task in settings["tasks"]:
+        task["run_if"] = "ALL_SUCCESS"
+    return {"job_id": job_id, "settings": settings}
+
+
+def _mock_jobs_list(requests_mock, jobs: list):
+    def list_jobs(request, context):
+        offset = int(request.qs.get("offset", [0])[0])
+        limit = int(request.qs["limit"][0])
+        return {
+            "jobs": jobs[offset : offset + limit],
+            "has_more": offset + limit < len(jobs),
+        }
+
+    return requests_mock.get(_jobs_url("list"), json=list_jobs)
+
+
+def test_jobs_list_pages(requests_mock):
+    """So that every job can be listed in one sweep
+    Given more jobs than fit in a page
+    Then all the pages are followed
+    """
+    jobs = [_remote_job(i, _job(f"job{i}")) for i in range(5)]
+    listing = _mock_jobs_list(requests_mock, jobs)
+
+    assert [j["job_id"] for j in Job.jobs_list()] == [0, 1, 2, 3, 4]
+    assert listing.call_count == 1
+    assert listing.last_request.qs["limit"] == ["100"]
+
+    listing = _mock_jobs_list(requests_mock, jobs)
+    assert [j["job_id"] for j in Job.jobs_list(limit=2)] == [0, 1, 2, 3, 4]
+    assert listing.call_count == 3
+
+
+def test_job_import_jobs_bulk(requests_mock, tmp_path):
+    """So that re-syncing hundreds of jobs is quick when little has changed
+    Given local jobs that are unchanged, changed, new and invalid
+    Then the jobs are listed once and only the changed and new jobs are imported
+    """
+    local = [_job("unchanged"), _job("changed", timeout=60), _job("new")]
+    local.append({"tasks": []})
+    for i, job in enumerate(local):
+        (tmp_path / f"job{i}.json").write_text(json.dumps(job))
+    remote = [
+        _remote_job(1, _job("unchanged")),
+        _remote_job(2, _job("changed")),
+        _remote_job(3, _job("other")),
+    ]
+    listing = _mock_jobs_list(requests_mock, remote)
+    create = requests_mock.post(_jobs_url("create"), json={"job_id": 4})
+    update = requests_mock.post(_jobs_url("update"), json={})
+
+    report = Job.job_import_jobs(
+        str(tmp_path), bulk=True, max_workers=4, raise_errors=False
+    )
+    statuses = {r["name"]: r["status"] for r in report["jobs"]}
+
+    assert listing.call_count == 1
+    assert statuses == {
+        "unchanged": "unchanged",
+        "changed": "updated",
+        "new": "created",
+        None: "failed",
+    }
+    assert create.call_count == 1
+    assert update.call_count == 1
+    assert update.last_request.json() == {"new_settings": local[1], "job_id": 2}
+
+    with pytest.raises(Exception, match="name"):
+        Job.job_import_jobs(str(tmp_path), bulk=True)
+
+
+def test_job_import_jobs_bulk_removed_setting(requests_mock, tmp_path):
+    """So that settings deleted locally are deleted from the remote jobs
+    Given a local job whose task has lost a parameter that's still on the remote job
+    Then the job is updated instead of reported unchanged
+    """
+    remote = _job("changed")
+    remote["tasks"][0]["notebook_task"]["base_parameters"] = {"a": "1", "b": "2"}
+    local = json.loads(json.dumps(remote))
+    del local["tasks"][0]["notebook_task"]["base_parameters"]["b"]
+    (tmp_path / "job.json").write_text(json.dumps(local))
+    _mock_jobs_list(requests_mock, [_remote_job(1, remote)])
+    update = requests_mock.post(_jobs_url("update"), json={})
+
+    report = Job.job_import_jobs(str(tmp_path), bulk=True)
+
+    assert report["jobs"] == [{"name": "changed", "status": "updated"}]
+    assert update.last_request.json() == {"new_settings": local, "job_id": 1}
+
+    (tmp_path / "job.json").write_text(json.dumps(remote))
+    report = Job.job_import_jobs(str(tmp_path), bulk=True)
+
+    assert report["unchanged"] == 1
+
+
+class _Runs:
+    """Fake runs api over runs that step through their states"""
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.list_calls = 0
+        self.get_calls = []
+
+    def _run(self, run_id: int):
+        return {
+            "run_id": run_id,
+            "state": {"life_cycle_state": self.steps.state(run_id)},
+        }
+
+    def list_active_runs(self):
+        self.list_calls += 1
+        runs = [self._run(r) for r in self.steps.states]
+        return [r for r in runs if r["state"]["life_cycle_state"] == "RUNNING"]
+
+    def get_run(self, run_id: int):
+        self.get_calls.append(run_id)
+        return self._run(run_id)
+
+
+def _states():
+    return {
+        1: ["PENDING", "RUNNING", "TERMINATED"],
+        2: ["PENDING", "RUNNING", "RUNNING", "RUNNING", "RUNNING", "TERMINATED"],
+        3: ["PENDING", "INTERNAL_ERROR"],
+    }
+
+
+def test_job_run_monitor(mocker, step_states):
+    """So that hundreds of concurrent runs can be tracked without redundant polling
+    Given several runs monitored together
+    Then each poll lists the active runs once and every state transition is delivered
+    """
+    steps = step_states(_states())
+    runs = _Runs(steps)
+    sleep = mocker.patch(
+        "autobricks._job_run_monitor.time.sleep", side_effect=steps.tick
+    )
+    transitions = []
+    monitor = Job.JobRunMonitor(
+        runs.list_active_runs,
+        runs.get_run,
+        [1, 2, 3],
+        on_transition=transitions.append,
+        min_poll_seconds=1,
+        max_poll_seconds=2,
+    )
+
+    final = monitor.wait()
+
+    assert {r: run["state"]["life_cycle_state"] for r, run in final.items()} == {
+        1: "TERMINATED",
+        2: "TERMINATED",
+        3: "INTERNAL_ERROR",
+    }
+    assert [(t["run_id"], t["state"]) for t in transitions if t["run_id"] == 2] == [
+        (2, "PENDING"),
+        (2, "RUNNING"),
+        (2, "TERMINATED"),
+    ]
+    assert runs.list_calls == 3
+    # single runs and runs that have left the active list are got individually
+    assert runs.get_calls.count(2) == 4
+    # the interval backs off while nothing changes
+    assert [c.args[0] for c in sleep.call_args_list] == [1, 1, 1, 1.5, 2]
+
+
+def test_job_run_monitor_timeout(mocker, step_states):
+    """So that orchestration doesn't hang on a run that never finishes
+    Given a timeout shorter than the runs take
+    Then waiting raises a TimeoutError
+    """
+    mocker.patch("autobricks._job_run_monitor.time.sleep")
+    clock = mocker.patch("autobricks._job_run_monitor.time.monotonic")
+    clock.side_effect = [0, 1, 2, 3]
+    runs = _Runs(step_states({1: ["RUNNING"]}))
+    monitor = Job.JobRunMonitor(runs.list_active_runs, runs.get_run, [1])
+
+    with pytest.raises(TimeoutError):
+        monitor.wait(timeout=2)
+
+
+def test_job_run_monitor_async(mocker, step_states):
+    """So that async orchestration can consume run transitions
+    Given several runs monitored with async for
+    Then the transitions are yielded until every run has finished
+    """
+    steps = step_states(_states())
+    runs = _Runs(steps)
+    mocker.patch(
+        "autobricks._job_run_monitor.asyncio.sleep", side_effect=steps.tick_async
+    )
+    monitor = Job.JobRunMonitor(runs.list_active_runs, runs.get_run, [1, 2, 3])
+
+    async def _transitions():
+        return [t async for t in monitor]
+
+    transitions = asyncio.run(_transitions())
+
+    assert len(transitions) == 8
+    assert monitor.done()
+
+
+def _mock_runs_list(requests_mock, runs: list, tokens: bool = False):
+    """Registers a runs listing of runs filtered by start time and paged by offset or token"""
+
+    def list_runs(request, context):
+        qs = request.qs
+        limit = int(qs["limit"][0])
+        offset = int(qs.get("page_token", qs.get("offset", [0]))[0])
+        start_from = int(qs.get("start_time_from", [0])[0])
+        start_to = int(qs.get("start_time_to", [2**62])[0])
+        matched = [r for r in runs if start_from <= r["start_time"] <= start_to]
+        response = {
+            "runs": matched[offset : offset + limit],
+            "has_more": offset + limit < len(matched),
+        }
+        if tokens and response["has_more"]:
+            response["next_page_token"] = str(offset + limit)
+        return response
+
+    return requests_mock.get(_jobs_url("runs/list"), json=list_runs)
+
+
+def _runs(count: int):
+    # latest first like the runs list
+    return [{"run_id": i, "start_time": 1000 - i} for i in range(count)]
+
+
+def test_job_runs_list_params(requests_mock):
+    """So that the runs can be filtered and paged
+    Given runs list parameters
+    Then they're passed to the api
+    """
+    listing = _mock_runs_list(requests_mock, _runs(10))
+
+    response = Job.job_runs_list(job_id=7, offset=5, limit=3)
+
+    assert [r["run_id"] for r in response["runs"]] == [5, 6, 7]
+    assert listing.last_request.qs["job_id"] == ["7"]
+
+
+@pytest.mark.parametrize("tokens", [False, True])
+def test_job_runs_iter(requests_mock, tokens):
+    """So that reports can be run over the whole run history
+    Given more runs than fit in a page
+    Then every page is followed by offset or by page token
+    """
+    listing = _mock_runs_list(requests_mock, _runs(12), tokens=tokens)
+
+    runs = list(Job.job_runs_iter(limit=5))
+
+    assert [r["run_id"] for r in runs] == list(range(12))
+    assert listing.call_count == 3
+
+
+def test_job_runs_iter_windows(requests_mock):
+    """So that large histories can be listed in parallel
+    Given a start time range split into windows
+    Then the windows are fetched concurrently and the runs are yielded once each latest first
+    """
+    listing = _mock_runs_list(requests_mock, _runs(100))
+
+    runs = list(
+        Job.job_runs_iter(
+            limit=10, start_time_from=901, start_time_to=1000, windows=4, max_workers=4
+        )
+    )
+
+    assert [r["run_id"] for r in runs] == list(range(100))
+    windows = {
+        (r.qs["start_time_from"][0], r.qs["start_time_to"][0])
+        for r in listing.request_history
+    }
+    assert windows == {("901", "925"), ("926", "950"), ("951", "975"), ("976", "1000")}
+
+    with pytest.raises(ValueError):
+        list(Job.job_runs_iter(windows=4))
+
+
+def test_job_runs_iter_windows_reversed_range(requests_mock):
+    """So that a mistyped time range fails clearly
+    Given a start_time_from after the start_time_to
+    Then a ValueError is raised before any runs are listed
+    """
+    listing = _mock_runs_list(requests_mock, _runs(10))
+
+    with pytest.raises(ValueError, match="is after start_time_to"):
+        list(Job.job_runs_iter(start_time_from=1000, start_time_to=901, windows=4))
+
+    assert listing.call_count == 0
+
+
+def test_job_runs_purge(requests_mock, mocker):
+    """So that retention jobs can keep up with the run history
+    Given old runs in different states where one fails to delete
+    Then only the old runs in the states are deleted and the counts are exact
+    """
+    mocker.patch.object(Job.time, "time", return_value=10 * 24 * 60 * 60 + 1)
+    day = 24 * 60 * 60 * 1000
+    runs = [
+        {
+            "run_id": i,
+            "start_time": (9 - i) * day,
+            "state": {
+                "life_cycle_state": "TERMINATED",
+                "result_state": "FAILED" if i % 2 else "SUCCESS",
+            },
+        }
+        for i in range(10)
+    ]
+    _mock_runs_list(requests_mock, runs)
+
+    def delete(request, context):
+        if request.json()["run_id"] == 9:
+            context.status_code = 400
+        return {}
+
+    deletes = requests_mock.post(_jobs_url("runs/delete"), json=delete)
+
+    report = Job.job_runs_purge(
+        older_than_days=5, states=["FAILED"], max_workers=4, raise_errors=False
+    )
+
+    # runs 4 to 9 started more than 5 days ago, the odd ones failed
+    assert report == {"deleted": 2, "skipped": 3, "failed": 1}
+    assert sorted(r.json()["run_id"] for r in deletes.request_history) == [5, 7, 9]
+    assert Job.job_run_delete(9) == {}
+
+
+def test_job_ids_cache(requests_mock):
+    """So that deploy scripts don't look up the same jobs again and again
+    Given jobs created, replaced, recreated and deleted
+    Then the jobs are listed once and the cache is kept up to date
+    """
+    remote = [_remote_job(i, _job(f"job{i}")) for i in range(5)]
+    listing = _mock_jobs_list(requests_mock, remote)
+    by_name = requests_mock.get(
+        _jobs_url("list") + "?name=new", json={"jobs": []}, complete_qs=False
+    )
+    created = {"job3": 10, "new": 11}
+    requests_mock.post(
+        _jobs_url("create"), json=lambda r, _: {"job_id": created[r.json()["name"]]}
+    )
+    update = requests_mock.post(_jobs_url("update"), json={})
+    delete = requests_mock.post(_jobs_url("delete"), json={})
+    requests_mock.post(_jobs_url("reset"), json={})
+
+    Job.job_create_or_replace(_job("job1"))
+    Job.job_create_or_replace(_job("job2"))
+    Job.job_recreate(_job("job3"))
+    Job.job_create_or_replace(_job("new"))
+
+    assert listing.call_count == 1
+    assert by_name.call_count == 1
+    assert [r.json()["job_id"] for r in update.request_history] == [1, 2]
+    assert delete.last_request.json() == {"job_id": 3}
+    assert Job.job_get_id("job3") == 10
+    assert Job.job_get_id("new") == 11
+
+    Job.job_delete(11)
+    Job.job_reset({"job_id": 4, "new_settings": _job("renamed")})
+    ids = Job.job_ids()
+    assert ids["job3"] == 10 and "new" not in ids
+    assert ids["renamed"] == 4 and "job4" not in ids
+    assert listing.call_count == 1
+
+    Job.job_ids_reset()
+    assert Job.job_ids()["job4"] == 4
+    assert listing.call_count == 2
@@ -0,0 +1,385 @@
+from autobricks import Sql
+import pytest
+
+
+def _workspace(mocker, existing: dict):
+    """Patches the workspace calls used by Sql with an in memory workspace of folders"""
+    folders = dict(existing)
+
+    def workspace_list(path: str):
+        if path != "/" and path not in folders:
+            raise Exception(f"{path} RESOURCE_DOES_NOT_EXIST")
+        objects = [
+            {"path": p, "object_id": i, "object_type": "DIRECTORY"}
+            for p, i in folders.items()
+            if p.rsplit("/", 1)[0] == path or (path == "/" and p.count("/") == 1)
+        ]
+        return {"objects": objects}
+
+    def workspace_mkdirs(path: str):
+        parts = path.strip("/").split("/")
+        for i in range(1, len(parts) + 1):
+            folder = "/" + "/".join(parts[:i])
+            folders.setdefault(folder, 1000 + len(folders))
+
+    mock_list = mocker.patch.object(Sql, "workspace_list", side_effect=workspace_list)
+    mock_mkdirs = mocker.patch.object(
+        Sql, "workspace_mkdirs", side_effect=workspace_mkdirs
+    )
+    return mock_list, mock_mkdirs
+
+
+def test_get_folder_ids_existing(mocker):
+    """So that importing many queries doesn't cost several requests per file
+    Given query folders that already exist
+    Then each parent is listed once and nothing is created
+    """
+    mock_list, mock_mkdirs = _workspace(
+        mocker, {"/Shared": 1, "/Shared/a": 2, "/Shared/b": 3}
+    )
+
+    paths = ["/Shared/a", "/Shared/b", "/Shared/a", "/Shared/b"]
+    folder_ids = Sql._get_folder_ids(paths, max_workers=4)
+
+    assert folder_ids == {"/Shared/a": 2, "/Shared/b": 3}
+    assert [c.args[0] for c in mock_list.call_args_list] == ["/Shared"]
+    mock_mkdirs.assert_not_called()
+
+
+def test_get_folder_ids_creates_missing(mocker):
+    """So that importing many queries doesn't cost several requests per file
+    Given query folders that don't exist
+    Then they're created once each and their ids resolved from one listing per parent
+    """
+    mock_list, mock_mkdirs = _workspace(mocker, {"/Shared": 1, "/Shared/a": 2})
+
+    paths = ["/Shared/a", "/Shared/b", "/Shared/c", "/Shared/c/d", "/Shared/b"]
+    folder_ids = Sql._get_folder_ids(paths, max_workers=4)
+
+    assert folder_ids["/Shared/a"] == 2
+    assert set(folder_ids) == {"/Shared/a", "/Shared/b", "/Shared/c", "/Shared/c/d"}
+    assert all(folder_ids.values())
+    created = [c.args[0] for c in mock_mkdirs.call_args_list]
+    assert sorted(created) == ["/Shared/b", "/Shared/c", "/Shared/c/d"]
+    assert created.index("/Shared/c") < created.index("/Shared/c/d")
+    listed = [c.args[0] for c in mock_list.call_args_list]
+    assert sorted(listed) == ["/Shared", "/Shared", "/Shared/c", "/Shared/c"]
+
+
+def _sql_url():
+    return Sql._api_service.get_url(
+        Sql.endpoint, "queries", preview=True, api_version=Sql._API_VERSION
+    )
+
+
+def _mock_queries(requests_mock, count: int, page_size: int, sql=None):
+    """Registers a paged queries listing of count queries"""
+
+    def page(request, context):
+        page = int(request.qs["page"][0])
+        start = (page - 1) * page_size
+        results = [
+            {
+                "id": f"id-{i}",
+                "name": f"Query {i}",
+                "data_source_id": "ds",
+                "query": sql(i) if sql else f"select {i}",
+                "tags": [],
+                "options": {"parent": "folders/1"},
+            }
+            for i in range(start, min(start + page_size, count))
+        ]
+        return {
+            "count": count,
+            "page": page,
+            "page_size": page_size,
+            "results": results,
+        }
+
+    return requests_mock.get(_sql_url(), json=page)
+
+
+def test_queries_catalogue(requests_mock):
+    """So that importing queries doesn't search for every query
+    Given a workspace with several pages of queries
+    Then the catalogue lists each page once and finds the queries by name in any case
+    """
+    listing = _mock_queries(requests_mock, count=25, page_size=10)
+
+    catalogue = Sql.queries_catalogue(page_size=10, max_workers=4)
+
+    assert len(catalogue) == 25
+    assert listing.call_count == 3
+    assert catalogue.get("query 7")["id"] == "id-7"
+    assert Sql.queries_get_query_id("QUERY 24", catalogue=catalogue) == {
+        "QUERY 24": {"id": "id-24", "data_source_id": "ds", "parent": "folders/1"}
+    }
+
+
+def test_queries_import_sql_catalogue(requests_mock):
+    """So that importing queries doesn't search for every query
+    Given a catalogue of the existing queries
+    Then creates, updates and moves keep the catalogue up to date without listing again
+    """
+    listing = _mock_queries(requests_mock, count=2, page_size=10)
+    catalogue = Sql.queries_catalogue()
+    url = _sql_url()
+    requests_mock.post(
+        url, json=lambda request, _: {"id": "id-new", "name": request.json()["name"]}
+    )
+    update = requests_mock.post(f"{url}/id-0", json={"id": "id-0", "name": "Query 0"})
+    delete = requests_mock.delete(f"{url}/id-1", json={})
+
+    Sql.queries_import_sql({"name": "New", "parent": "folders/1"}, catalogue)
+    Sql.queries_import_sql({"name": "Query 0", "parent": "folders/1"}, catalogue)
+    Sql.queries_import_sql({"name": "Query 1", "parent": "folders/2"}, catalogue)
+
+    assert listing.call_count == 1
+    assert update.call_count == 1
+    assert delete.call_count == 1
+    assert catalogue.get("new")["id"] == "id-new"
+    assert catalogue.get("query 1") == {
+        "id": "id-new",
+        "name": "Query 1",
+        "data_source_id": "ds",
+        "parent": "folders/2",
+    }
+    assert len(catalogue) == 3
+
+
+def test_queries_concurrent_pages(requests_mock):
+    """So that listing thousands of queries isn't limited by request latency
+    Given several pages of queries
+    Then fetching the pages concurrently returns the same queries in the same order
+    """
+    listing = _mock_queries(requests_mock, count=95, page_size=10)
+
+    serial = Sql.queries(page_size=10)
+    assert listing.call_count == 10
+
+    concurrent = Sql.queries(page_size=10, max_workers=4)
+    assert listing.call_count == 20
+    assert concurrent == serial
+    assert [q["id"] for q in concurrent] == [f"id-{i}" for i in range(95)]
+
+
+def test_queries_iter_streams(requests_mock):
+    """So that exports can start before the last page arrives
+    Given several pages of queries
+    Then the generator only fetches the pages as they're consumed
+    """
+    listing = _mock_queries(requests_mock, count=30, page_size=10)
+
+    stream = Sql.queries_iter(page_size=10)
+    first = [next(stream) for _ in range(10)]
+
+    assert listing.call_count == 1
+    assert first[0]["id"] == "id-0"
+    assert len(list(stream)) == 20
+    assert listing.call_count == 3
+
+
+def _write_queries(path, names):
+    folder = path / "Shared" / "reports"
+    folder.mkdir(parents=True)
+    for name in names:
+        (folder / f"{name}.sql").write_text(f"select '{name}'")
+        (folder / f"{name}.yaml").write_text(
+            f"name: {name}\nquery: ./{name}.sql\ntags: []\noptions: {{}}\n"
+        )
+    return str(path)
+
+
+def test_queries_import_sql_files_parallel(requests_mock, mocker, tmp_path):
+    """So that deploying hundreds of queries isn't limited by request latency
+    Given queries imported concurrently where one fails and one is throttled
+    Then the others are still imported and the report has the status and retries of each
+    """
+    names = ["Bad", "Throttled"] + [f"Query{i}" for i in range(6)]
+    from_path = _write_queries(tmp_path, names)
+    _workspace(mocker, {"/Shared": 1})
+    mocker.patch("autobricks.api_service._base_api.time.sleep")
+    _mock_queries(requests_mock, count=0, page_size=10)
+    throttled = []
+
+    def create(request, context):
+        name = request.json()["name"]
+        if name == "Bad":
+            context.status_code = 400
+            return {"message": "bad query"}
+        if name == "Throttled" and not throttled:
+            throttled.append(name)
+            context.status_code = 429
+            context.headers["Retry-After"] = "0"
+            return {}
+        return {"id": f"id-{name}", "name": name}
+
+    create_mock = requests_mock.post(_sql_url(), json=create)
+
+    report = Sql.queries_import_sql_files(from_path, max_workers=4, raise_errors=False)
+    statuses = {q["name"]: q for q in report["queries"]}
+
+    assert create_mock.call_count == len(names) + 1
+    assert report["succeeded"] == len(names) - 1
+    assert report["failed"] == 1
+    assert statuses["Bad"]["status"] == "failed"
+    assert statuses["Throttled"]["status"] == "succeeded"
+    assert statuses["Throttled"]["retries"] == 1
+    assert statuses["Query0"]["retries"] == 0
+    assert report["retries"] == 1
+
+    with pytest.raises(Exception, match="Failed to import query"):
+        Sql.queries_import_sql_files(from_path, max_workers=4)
+
+
+def test_queries_export_sql_files_unchanged(requests_mock, mocker, tmp_path):
+    """So that nightly snapshots have stable mtimes and git diffs
+    Given queries exported concurrently twice where one query changes in between
+    Then the second export only rewrites the files of the changed query
+    """
+    _mock_queries(requests_mock, count=25, page_size=10)
+    mocker.patch.object(
+        Sql, "workspace_find_paths", return_value={"1": "Shared/reports"}
+    )
+    makedirs = mocker.spy(Sql.os, "makedirs")
+    to_path = tmp_path / "export"
+
+    report = Sql.queries_export_sql_files(str(to_path), page_size=10, max_workers=4)
+
+    folder = to_path / "Shared" / "reports"
+    assert report == {"written": 50, "unchanged": 0}
+    assert [c.args[0] for c in makedirs.call_args_list].count(str(folder)) == 1
+    assert (folder / "Query 3.sql").read_text() == "select 3"
+    mtimes = {f.name: f.stat().st_mtime_ns for f in folder.iterdir()}
+
+    _mock_queries(
+        requests_mock,
+        count=25,
+        page_size=10,
+        sql=lambda i: "select 'changed'" if i == 3 else f"select {i}",
+    )
+    report = Sql.queries_export_sql_files(str(to_path), page_size=10, max_workers=4)
+
+    assert report == {"written": 1, "unchanged": 49}
+    assert (folder / "Query 3.sql").read_text() == "select 'changed'"
+    for f in folder.iterdir():
+        if f.name != "Query 3.sql":
+            assert f.stat().st_mtime_ns == mtimes[f.name]
+
+
+def test_queries_export_sql_index_settings(requests_mock, mocker):
+    """So that exports in short lived processes can reuse the workspace index
+    Given an index ttl and persist path
+    Then they're passed through to the workspace index of the query folders
+    """
+    _mock_queries(requests_mock, count=2, page_size=10)
+    find_paths = mocker.patch.object(
+        Sql, "workspace_find_paths", return_value={"1": "Shared/reports"}
+    )
+
+    queries = Sql.queries_export_sql(index_ttl=60, index_persist_path="index.json")
+
+    assert list(queries) == ["Query 0", "Query 1"]
+    assert find_paths.call_args.kwargs == {"ttl": 60, "persist_path": "index.json"}
+
+
+def _permissions_url(object_id: str):
+    return Sql._api_service.get_url(
+        Sql.endpoint,
+        f"permissions/queries/{object_id}",
+        preview=True,
+        api_version=Sql._API_VERSION,
+    )
+
+
+def test_set_acls(requests_mock, monkeypatch):
+    """So that re-sharing hundreds of queries doesn't double the request count
+    Given objects where one is already shared, one isn't and one fails
+    Then only the unshared object is posted and its permissions are cached
+    """
+    monkeypatch.setattr(Sql, "_acls", {})
+    shared = [{"group_name": "analysts", "permission_level": "CAN_RUN"}]
+    owner = [{"user_name": "owner@autobricks.net", "permission_level": "CAN_MANAGE"}]
+    gets = [
+        requests_mock.get(_permissions_url("1"), json={"access_control_list": shared}),
+        requests_mock.get(_permissions_url("2"), json={"access_control_list": owner}),
+        requests_mock.get(_permissions_url("3"), status_code=404),
+    ]
+    post = requests_mock.post(
+        _permissions_url("2"), json={"access_control_list": owner + shared}
+    )
+
+    acls = {"1": "analysts", "2": ["analysts"], "3": "analysts"}
+    report = Sql.set_acls(acls, max_workers=3, raise_errors=False)
+    statuses = {r["object_id"]: r["status"] for r in report["objects"]}
+
+    assert statuses == {"1": "skipped", "2": "updated", "3": "failed"}
+    assert (report["updated"], report["skipped"], report["failed"]) == (1, 1, 1)
+    assert post.call_count == 1
+    assert post.last_request.json() == shared
+
+    report = Sql.set_acls({"1": "analysts", "2": "analysts"})
+    assert report["skipped"] == 2
+    assert post.call_count == 1
+    assert [g.call_count for g in gets[:2]] == [1, 1]
+
+    report = Sql.set_acls({"2": ("analysts", Sql.PermissionLevel.CAN_MANAGE)})
+    assert report["updated"] == 1
+    assert post.call_count == 2
+
+
+def test_set_acls_refresh(requests_mock, monkeypatch):
+    """So that permissions changed outside the process aren't skipped
+    Given cached permissions that have been changed elsewhere
+    Then refresh, acls_reset and deleting the query get them again
+    """
+    monkeypatch.setattr(Sql, "_acls", {})
+    shared = [{"group_name": "analysts", "permission_level": "CAN_RUN"}]
+    get = requests_mock.get(
+        _permissions_url("1"),
+        [
+            {"json": {"access_control_list": shared}},
+            {"json": {"access_control_list": []}},
+        ],
+    )
+    post = requests_mock.post(_permissions_url("1"), json={"access_control_list": []})
+    requests_mock.delete(f"{_sql_url()}/1", json={})
+
+    assert Sql.set_acls({"1": "analysts"})["skipped"] == 1
+    assert Sql.set_acls({"1": "analysts"}, refresh=True)["updated"] == 1
+    assert (get.call_count, post.call_count) == (2, 1)
+
+    Sql.acls_reset()
+    Sql.get_acl("1")
+    assert get.call_count == 3
+
+    Sql.queries_delete("1")
+    assert Sql._acls == {}
+
+
+def test_set_acls_removed_principal(requests_mock, monkeypatch):
+    """So that removing someone from share_with takes their access away
+    Given an object shared with a group that's no longer requested
+    Then the permissions are posted to replace the access control list
+    """
+    monkeypatch.setattr(Sql, "_acls", {})
+    owner = [{"user_name": "owner@autobricks.net", "permission_level": "CAN_MANAGE"}]
+    analysts = [{"group_name": "analysts", "permission_level": "CAN_RUN"}]
+    removed = [{"group_name": "removed", "permission_level": "CAN_RUN"}]
+    requests_mock.get(
+        _permissions_url("1"),
+        json={"access_control_list": owner + analysts + removed},
+    )
+    post = requests_mock.post(
+        _permissions_url("1"), json={"access_control_list": owner + analysts}
+    )
+
+    report = Sql.set_acls({"1": "analysts"})
+
+    assert report["updated"] == 1
+    assert post.last_request.json() == analysts
+
+    report = Sql.set_acls({"1": "analysts"})
+
+    assert report["skipped"] == 1
+    assert post.call_count == 1
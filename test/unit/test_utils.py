@@ -1,6 +1,7 @@
 import sys
 from pytest_mock import mocker
-from autobricks import _decode_utils
+from autobricks import _decode_utils, _common
+import pytest
 
 def test_base64_decode_utf8():
 
@@ -238,3 +239,28 @@ def test_is_not_windows(mocker):
 
     mocker.patch.object(sys, "platform", "linux")
     assert not _decode_utils.is_windows()
+
+
+def test_run_all_keeps_order():
+
+    items = [3, 1, 2, 0]
+    serial = _common.run_all(lambda i: i * 2, items)
+    concurrent = _common.run_all(lambda i: i * 2, items, max_workers=4)
+
+    assert serial == concurrent == [6, 2, 4, 0]
+
+
+def test_status_report_raise_failed():
+
+    results = [
+        {"status": "succeeded"},
+        {"status": "failed", "error": "a failed"},
+        {"status": "failed", "error": "b failed"},
+    ]
+    report = _common.status_report(results, ["succeeded", "failed"], "items")
+
+    assert report == {"items": results, "succeeded": 1, "failed": 2}
+    assert _common.status_report(results, ["failed"]) == {"failed": 2}
+    with pytest.raises(Exception, match="a failed\nb failed"):
+        _common.raise_failed(results)
+    _common.raise_failed(results[:1])
@@ -0,0 +1,329 @@
+from autobricks import Workspace
+from autobricks.api_service import configuration
+
+from dataclasses import dataclass
+import json
+import pytest
+
+
+@pytest.fixture
+def config():
+    @dataclass
+    class Config:
+        config: dict
+        host: str
+        version: str
+        endpoint: str
+
+    return Config(
+        config=configuration,
+        host=configuration["databricks_api_host"],
+        version="2.0",
+        endpoint="workspace",
+    )
+
+
+@pytest.fixture
+def workspace_mock(requests_mock, config):
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
+    requests_mock.post(f"{url}/mkdirs", json={})
+    requests_mock.post(f"{url}/import", json={})
+    return requests_mock
+
+
+def _mkdirs_paths(requests_mock):
+    return [
+        r.json()["path"]
+        for r in requests_mock.request_history
+        if r.path.endswith("/mkdirs")
+    ]
+
+
+def test_workspace_import_dir_parallel(workspace_mock):
+    """So that large deployments aren't limited by request latency
+        Given a directory of notebooks deployed with max_workers > 1
+        Then the actions should be identical and in the same order as a serial deployment
+    """
+    from_path = "./test/artefacts/notebooks"
+    to_path = "/autobricks_unittest"
+
+    serial = Workspace.workspace_import_dir(from_path, to_path)
+    serial_dirs = _mkdirs_paths(workspace_mock)
+    workspace_mock.reset_mock()
+
+    parallel = Workspace.workspace_import_dir(from_path, to_path, max_workers=8)
+    parallel_dirs = _mkdirs_paths(workspace_mock)
+
+    assert parallel == serial
+    assert len(parallel["actions"]) == 20
+    assert sorted(parallel_dirs) == sorted(serial_dirs)
+
+
+def test_workspace_import_dir_parallel_dir_levels(workspace_mock):
+    """So that parent directories always exist before their children
+        Given a directory of notebooks deployed with max_workers > 1
+        Then every directory should be created after its parent directory
+    """
+    to_path = "/autobricks_unittest"
+    Workspace.workspace_import_dir(
+        "./test/artefacts/notebooks", to_path, max_workers=8
+    )
+    dirs = _mkdirs_paths(workspace_mock)
+
+    for i, d in enumerate(dirs):
+        parent = d.rsplit("/", 1)[0]
+        if d != to_path:
+            assert parent in dirs[:i]
+
+
+def _import_paths(requests_mock):
+    return [
+        r.json()["path"]
+        for r in requests_mock.request_history
+        if r.path.endswith("/import")
+    ]
+
+
+def test_workspace_import_dir_incremental(workspace_mock, tmp_path):
+    """So that unchanged notebooks aren't re-deployed
+        Given an incremental deployment with a manifest
+        Then only files that changed since the last deployment should be imported
+    """
+    from_path = tmp_path / "notebooks"
+    (from_path / "sub").mkdir(parents=True)
+    (from_path / "a.py").write_text("a")
+    (from_path / "sub" / "b.py").write_text("b")
+    manifest = str(tmp_path / "manifest.json")
+    to_path = "/autobricks_unittest"
+
+    first = Workspace.workspace_import_dir(
+        str(from_path), to_path, manifest_path=manifest
+    )
+    assert [a["action"] for a in first["actions"]] == ["import", "import"]
+
+    workspace_mock.reset_mock()
+    (from_path / "sub" / "b.py").write_text("changed")
+    second = Workspace.workspace_import_dir(
+        str(from_path), to_path, manifest_path=manifest
+    )
+
+    assert [a["action"] for a in second["actions"]] == ["skip", "import"]
+    assert _import_paths(workspace_mock) == [f"{to_path}/sub/b.py"]
+
+
+def test_workspace_import_dir_incremental_delete_removed(
+    workspace_mock, config, tmp_path
+):
+    """So that notebooks removed from source control are removed from the workspace
+        Given an incremental deployment with delete_removed
+        Then notebooks deployed previously that no longer exist locally should be deleted
+    """
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
+    workspace_mock.post(f"{url}/delete", json={})
+    workspace_mock.get(
+        f"{url}/get-status",
+        json={"object_type": "NOTEBOOK", "path": "/autobricks_unittest/b"},
+    )
+
+    from_path = tmp_path / "notebooks"
+    from_path.mkdir()
+    (from_path / "a.py").write_text("a")
+    (from_path / "b.py").write_text("b")
+    manifest = str(tmp_path / "manifest.json")
+    to_path = "/autobricks_unittest"
+
+    Workspace.workspace_import_dir(str(from_path), to_path, manifest_path=manifest)
+    (from_path / "b.py").unlink()
+    result = Workspace.workspace_import_dir(
+        str(from_path), to_path, manifest_path=manifest, delete_removed=True
+    )
+
+    assert result["actions"][-1] == {
+        "action": "delete",
+        "to_file_path": f"{to_path}/b",
+    }
+    deleted = [
+        r.json()["path"]
+        for r in workspace_mock.request_history
+        if r.path.endswith("/delete")
+    ]
+    assert deleted == [f"{to_path}/b"]
+
+
+_WORKSPACE_TREE = {
+    "/": [
+        {"object_id": 1, "object_type": "DIRECTORY", "path": "/Shared"},
+        {"object_id": 2, "object_type": "DIRECTORY", "path": "/Users"},
+    ],
+    "/Shared": [
+        {"object_id": 3, "object_type": "DIRECTORY", "path": "/Shared/queries"},
+        {"object_id": 4, "object_type": "NOTEBOOK", "path": "/Shared/notebook"},
+    ],
+    "/Shared/queries": [],
+    "/Users": [
+        {"object_id": 5, "object_type": "DIRECTORY", "path": "/Users/me"},
+    ],
+    "/Users/me": [],
+}
+
+
+@pytest.fixture
+def workspace_list_mock(requests_mock, config):
+    def _list(request, context):
+        objects = _WORKSPACE_TREE[request.json()["path"]]
+        return {"objects": objects} if objects else {}
+
+    url = f"{config.host}/api/{config.version}/{config.endpoint}/list"
+    Workspace._workspace_indexes.clear()
+    yield requests_mock.get(url, json=_list)
+    Workspace._workspace_indexes.clear()
+
+
+def test_workspace_find_paths(workspace_list_mock):
+    """So that query folders can be mapped to workspace paths
+        Given a list of folder ids
+        Then the workspace paths of the folders should be returned from a crawl of the workspace
+    """
+    result = Workspace.workspace_find_paths(["3", "5", "99"])
+
+    assert result == {"3": "/Shared/queries", "5": "/Users/me"}
+    assert workspace_list_mock.call_count == 5
+
+
+def test_workspace_find_paths_cached(workspace_list_mock):
+    """So that repeated lookups don't re-crawl the workspace
+        Given the workspace has been indexed within the ttl
+        Then finding paths again should make no api calls
+    """
+    Workspace.workspace_find_paths(["3"], "Shared")
+    result = Workspace.workspace_find_paths(["3", "4"], "Shared")
+
+    assert result == {"3": "/Shared/queries", "4": "/Shared/notebook"}
+    assert workspace_list_mock.call_count == 2
+
+
+def test_workspace_index_persisted(workspace_list_mock, tmp_path):
+    """So that short lived processes can reuse the index
+        Given an index persisted to disk
+        Then a new index should be loaded without crawling the workspace
+    """
+    persist_path = str(tmp_path / "index.json")
+    Workspace.workspace_index(persist_path=persist_path)
+    Workspace._workspace_indexes.clear()
+
+    index = Workspace.workspace_index(persist_path=persist_path)
+
+    assert index.get_path(5) == "/Users/me"
+    assert index.get("/Shared/notebook")["object_type"] == "NOTEBOOK"
+    assert workspace_list_mock.call_count == 5
+
+
+def test_workspace_index_settings_per_call(workspace_list_mock, tmp_path):
+    """So that callers sharing an index don't change each other's settings
+        Given an index that already exists for a root
+        Then a new persist_path should get its own index
+        And a ttl should only apply to the call it's given to
+    """
+    index = Workspace.workspace_index("/Shared")
+    persist_path = str(tmp_path / "index.json")
+    persisted = Workspace.workspace_index("/Shared", persist_path=persist_path)
+
+    assert persisted is not index
+    assert persisted.persist_path == persist_path
+    assert (tmp_path / "index.json").exists()
+    assert workspace_list_mock.call_count == 4
+
+    Workspace.workspace_index("/Shared", ttl=-1)
+    assert workspace_list_mock.call_count == 6
+    assert index.ttl == Workspace.DEFAULT_TTL
+
+    Workspace.workspace_index("/Shared")
+    assert workspace_list_mock.call_count == 6
+
+
+def test_workspace_find_paths_persisted(workspace_list_mock, tmp_path):
+    """So that query exports in short lived processes can reuse the index
+        Given a persist_path passed to workspace_find_paths
+        Then the index of each root folder should be saved to its own file
+    """
+    persist_path = str(tmp_path / "index.json")
+    result = Workspace.workspace_find_paths(
+        ["3", "5"], ["Shared", "Users"], persist_path=persist_path
+    )
+    Workspace._workspace_indexes.clear()
+    cached = Workspace.workspace_find_paths(
+        ["3", "5"], ["Shared", "Users"], persist_path=persist_path
+    )
+
+    assert result == cached == {"3": "/Shared/queries", "5": "/Users/me"}
+    assert (tmp_path / "index.json.Shared").exists()
+    assert (tmp_path / "index.json.Users").exists()
+    assert workspace_list_mock.call_count == 4
+
+
+def test_workspace_import_dir_incremental_relocated(workspace_mock, config, tmp_path):
+    """So that CI agents checking out to different directories don't delete notebooks
+        Given an incremental deployment with delete_removed from a relocated copy
+        Then unchanged notebooks should be skipped and nothing should be deleted
+    """
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
+    delete = workspace_mock.post(f"{url}/delete", json={})
+
+    manifest = str(tmp_path / "manifest.json")
+    to_path = "/autobricks_unittest"
+    for checkout in ["agent1", "agent2"]:
+        from_path = tmp_path / checkout / "notebooks"
+        (from_path / "sub").mkdir(parents=True)
+        (from_path / "x.py").write_text("x")
+        (from_path / "sub" / "y.py").write_text("y")
+
+    Workspace.workspace_import_dir(
+        str(tmp_path / "agent1" / "notebooks"), to_path, manifest_path=manifest
+    )
+    result = Workspace.workspace_import_dir(
+        str(tmp_path / "agent2" / "notebooks"),
+        to_path,
+        manifest_path=manifest,
+        delete_removed=True,
+    )
+
+    assert [a["action"] for a in result["actions"]] == ["skip", "skip"]
+    assert delete.call_count == 0
+
+
+def test_workspace_import_dir_delete_removed_already_deleted(
+    workspace_mock, config, tmp_path
+):
+    """So that a notebook deleted by hand doesn't fail the deployment
+        Given a removed notebook that's already been deleted from the workspace
+        Then the deployment should carry on and record it as already deleted
+    """
+    url = f"{config.host}/api/{config.version}/{config.endpoint}"
+    workspace_mock.post(
+        f"{url}/delete", status_code=404, json={"error_code": "RESOURCE_DOES_NOT_EXIST"}
+    )
+    workspace_mock.get(
+        f"{url}/get-status",
+        status_code=404,
+        json={"error_code": "RESOURCE_DOES_NOT_EXIST"},
+    )
+
+    from_path = tmp_path / "notebooks"
+    from_path.mkdir()
+    (from_path / "a.py").write_text("a")
+    (from_path / "b.py").write_text("b")
+    manifest = str(tmp_path / "manifest.json")
+    to_path = "/autobricks_unittest"
+
+    Workspace.workspace_import_dir(str(from_path), to_path, manifest_path=manifest)
+    (from_path / "b.py").unlink()
+    result = Workspace.workspace_import_dir(
+        str(from_path), to_path, manifest_path=manifest, delete_removed=True
+    )
+
+    assert result["actions"][-1] == {
+        "action": "already_deleted",
+        "to_file_path": f"{to_path}/b.py",
+    }
+    with open(manifest, "r", encoding="utf-8") as file:
+        assert list(json.load(file)["files"]) == [f"{to_path}/a.py"]